@@ -0,0 +1,63 @@
+"""Exact and polygon computations of the total diversity.
+
+For the effects of FixedMixture runs, compares `diversity_score` with the
+'shapely' method (union of 64-gons) and the 'exact' method (analytic area of
+the union of disks), and reports their durations and relative deviation. A
+union of 1024-gons, much closer to the disks, serves as reference.
+
+Then, on a clustered run, times the incremental coverage engines of
+`CoverageCurve` by blocks of steps: the cost of an addition should not grow
+with the number of past effects.
+"""
+import time
+
+import shapely.geometry
+import shapely.ops
+
+from icdl2015.run import just_run
+from icdl2015.coverage import ExactCoverage, ShapelyCoverage
+from icdl2015.exploration import diversity_score
+
+
+runs = [dict(seed=0, T=10000, dim=20, limit=150, d=0.05, adapt_on=False, motor_ratio=0.2),
+        dict(seed=0, T=10000, dim=20, limit=150, d=0.5, adapt_on=False, motor_ratio=0.5),
+        dict(seed=0, T=10000, dim=7, limit=150, d=0.05, adapt_on=False, motor_ratio=0.05)]
+τ = 0.02
+clustered_run = dict(seed=0, T=10000, dim=20, limit=150, d=0.001, adapt_on=False,
+                     motor_ratio=0.05, nn_backend='brute')
+block = 2000
+
+
+def timed(f, *args, **kwargs):
+    start = time.time()
+    result = f(*args, **kwargs)
+    return result, time.time() - start
+
+def block_times(coverage, effects):
+    """Return the durations of the additions of effects, by blocks of steps."""
+    times = []
+    for start in range(0, len(effects), block):
+        _, duration = timed(lambda: [coverage.add(e) for e in effects[start:start+block]])
+        times.append(duration)
+    return times
+
+
+if __name__ == '__main__':
+    print('{:>8} {:>10} {:>10} {:>12} {:>12} {:>10} {:>10}'.format(
+          'dim', 'd', 'ratio', 'shapely Δ', 'exact Δ', 'shapely (s)', 'exact (s)'))
+    for params in runs:
+        effects = just_run(**params)['effects']
+        polygon_area, polygon_time = timed(diversity_score, effects, τ)
+        exact_area, exact_time = timed(diversity_score, effects, τ, method='exact')
+        reference = shapely.ops.unary_union([shapely.geometry.Point(xy).buffer(τ, 256)
+                                             for xy in effects]).area
+        print('{:>8} {:>10} {:>10} {:>+12.4%} {:>+12.4%} {:>10.2f} {:>10.2f}'.format(
+              params['dim'], params['d'], params['motor_ratio'],
+              polygon_area/reference - 1, exact_area/reference - 1,
+              polygon_time, exact_time))
+
+    effects = just_run(**clustered_run)['effects']
+    print('\nclustered run, duration of each block of {} steps (s)'.format(block))
+    for name, coverage in [('shapely', ShapelyCoverage(τ)), ('exact', ExactCoverage(τ))]:
+        print('{:>8} '.format(name) + ' '.join('{:>8.2f}'.format(duration)
+                                            for duration in block_times(coverage, effects)))
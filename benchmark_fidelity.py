@@ -0,0 +1,60 @@
+"""Error and speed of the fidelity tiers of the Shapely coverage computations.
+
+For each tier of `coverage.FIDELITIES`, reports the relative error of the
+coverage area, compared to the exact area of the union of the disks
+(`coverage.union_area`), and the speedup compared to the 'standard' tier, on:
+  - the figure 3 workload: the incremental coverage of `DiversityMeasure`
+    (replayed on the effects of adaptive runs, shortened to T=2000), and the
+    union drawn by `graphs.Figure.coverage` (T=5000);
+  - the figure 4 workload: the total diversity of FixedMixture runs (T=10000).
+"""
+import time
+
+import numpy as np
+
+from icdl2015.run import just_run
+from icdl2015.coverage import FIDELITIES, ShapelyCoverage, union_area
+from icdl2015.exploration import diversity_score
+
+
+τ = 0.02
+ds = [0.001, 0.05, 0.5]
+tiers = list(FIDELITIES) # from the fastest to the most accurate
+
+
+def incremental(effects, fidelity):
+    coverage = ShapelyCoverage(τ, fidelity=fidelity)
+    for effect in effects:
+        coverage.add(effect)
+    return coverage.area
+
+def union(effects, fidelity):
+    return diversity_score(effects, τ, fidelity=fidelity)
+
+def measure(workload, f, effects_list):
+    exact = [union_area(effects, τ) for effects in effects_list]
+    errors, durations = {}, {}
+    for fidelity in tiers:
+        start = time.time()
+        errors[fidelity] = np.array([f(effects, fidelity)/area - 1
+                                     for effects, area in zip(effects_list, exact)])
+        durations[fidelity] = time.time() - start
+    for fidelity in tiers:
+        worst = errors[fidelity][np.argmax(np.abs(errors[fidelity]))]
+        print('{:>24} {:>10} {:>+10.3%} {:>+10.3%} {:>10.2f}'.format(
+              workload, fidelity, np.mean(errors[fidelity]), worst,
+              durations['standard']/durations[fidelity]))
+
+
+if __name__ == '__main__':
+    # the 'exact' coverage engine only changes the trajectories marginally, and is faster.
+    adapt = [just_run(0, 5000, 20, 150, d, True, τ=τ, α=0.1, window=50,
+                      coverage='exact')['effects'] for d in ds]
+    fixed = [just_run(0, 10000, 20, 150, d, False, motor_ratio=motor_ratio)['effects']
+             for d in ds for motor_ratio in [0.05, 0.5]]
+
+    print('{:>24} {:>10} {:>10} {:>10} {:>10}'.format(
+          'workload', 'tier', 'mean err.', 'max err.', 'speedup'))
+    measure('fig. 3 DiversityMeasure', incremental, [effects[:2000] for effects in adapt])
+    measure('fig. 3 coverage', union, adapt)
+    measure('fig. 4 total diversity', union, fixed)
@@ -0,0 +1,42 @@
+"""Micro-benchmark of single nearest neighbor queries.
+
+Compares, for k=1 `nn_y` queries, the per-query latency of the generic
+`NNSet._nn_k` path (input validation by sklearn and generic merge) with the
+dedicated `NNSet._nn1` fast path, for different numbers of observations.
+"""
+import time
+
+import numpy as np
+
+from icdl2015.neighbors import NNSet
+
+
+dim_x, dim_y = 20, 2
+sizes = [50, 150, 1000, 10000]
+n_queries = 2000
+
+def latency(query, queries):
+    """Return the median latency of `query`, in microseconds."""
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        query(q)
+        timings.append(time.perf_counter() - start)
+    return 1e6 * np.median(timings)
+
+if __name__ == '__main__':
+    rng = np.random.RandomState(0)
+    print('{:>8} {:>12} {:>12} {:>8}'.format('size', 'generic (µs)', 'fast (µs)', 'speedup'))
+    for size in sizes:
+        nn = NNSet()
+        for t, (x, y) in enumerate(zip(rng.uniform(-150, 150, (size, dim_x)),
+                                       rng.uniform(-1, 1, (size, dim_y)))):
+            nn.add(x, y)
+            if t == size - 50:
+                nn.nn_y(y) # builds the tree, leaving 50 observations in the pool.
+        queries = rng.uniform(-1, 1, (n_queries, dim_y))
+
+        t_generic = latency(lambda q: nn._nn_k(1, q, 1), queries)
+        t_fast    = latency(lambda q: nn._nn1(1, q), queries)
+        print('{:>8} {:>12.1f} {:>12.1f} {:>7.1f}x'.format(size, t_generic, t_fast,
+                                                          t_generic/t_fast))
@@ -0,0 +1,68 @@
+"""Effect of approximate nearest neighbors queries on the exploration.
+
+For each value of eps, runs the FixedMixture strategy with approximate `nn_y`
+queries, and reports how often the approximate neighbor differs from the
+exact one, the relative change of `total_diversity` compared to exact
+queries, and the run duration.
+"""
+import time
+
+import numpy as np
+
+from icdl2015 import neighbors
+from icdl2015.run import just_run
+
+
+backends = ['ckdtree', 'grid']
+epsilons = [0.0, 0.1, 0.5, 1.0, 2.0]
+seeds = [0, 1, 2]
+T, dim, limit, d, motor_ratio = 5000, 20, 150, 0.05, 0.2
+
+
+def checked(cls):
+    """Return a subclass of `cls` that counts the approximate `nn_y` results
+    differing from the exact ones."""
+    class CheckedNNSet(cls):
+        queries, mismatches = 0, 0
+
+        def _nn(self, side, v, k=1):
+            result = super(CheckedNNSet, self)._nn(side, v, k=k)
+            if side == 1:
+                eps, self.eps = self.eps, 0.0
+                exact = super(CheckedNNSet, self)._nn(side, v, k=k)
+                self.eps = eps
+                CheckedNNSet.queries += 1
+                CheckedNNSet.mismatches += not np.array_equal(result[1], exact[1])
+            return result
+    return CheckedNNSet
+
+checked_classes = {'ckdtree': checked(neighbors.CKDTreeNNSet),
+                   'grid':    checked(neighbors.GridNNSet)}
+neighbors.BACKENDS['checked_ckdtree'] = (lambda y_bounds, **kwargs:
+    checked_classes['ckdtree'](**kwargs))
+neighbors.BACKENDS['checked_grid'] = (lambda y_bounds, **kwargs:
+    checked_classes['grid'](y_bounds, **kwargs))
+neighbors.APPROXIMATE_BACKENDS.update({'checked_ckdtree', 'checked_grid'})
+
+
+if __name__ == '__main__':
+    print('{:>8} {:>5} {:>10} {:>12} {:>9}'.format(
+          'backend', 'eps', 'mismatch', 'diversity Δ', 'time (s)'))
+    for backend in backends:
+        exact = {}
+        for eps in epsilons:
+            cls = checked_classes[backend]
+            cls.queries, cls.mismatches = 0, 0
+            deltas, durations = [], []
+            for seed in seeds:
+                start = time.time()
+                just_run(seed, T, dim, limit, d, False, motor_ratio=motor_ratio,
+                         nn_backend=backend, nn_eps=eps) # timed without checks
+                durations.append(time.time() - start)
+                results = just_run(seed, T, dim, limit, d, False, motor_ratio=motor_ratio,
+                                   nn_backend='checked_' + backend, nn_eps=eps)
+                exact.setdefault(seed, results['total_diversity'])
+                deltas.append(results['total_diversity']/exact[seed] - 1)
+            print('{:>8} {:>5} {:>9.2%} {:>+12.2%} {:>9.2f}'.format(
+                  backend, eps, cls.mismatches/cls.queries, np.mean(deltas),
+                  np.mean(durations)))
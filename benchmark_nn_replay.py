@@ -0,0 +1,104 @@
+"""Differential benchmark of the nearest neighbors implementations.
+
+Records the stream of additions and `nn_y` queries received by the inverse
+model during `just_run`, then replays it against every backend of
+`neighbors.BACKENDS` and against the `BruteForceNNSet` oracle. For each
+backend, reports the number of queries whose neighbor is farther from the goal
+than the oracle's one (equidistant neighbors are accepted), the throughput of
+additions and queries, and the query latency.
+
+Traces are saved in the `runs/` folder, and reused if present.
+"""
+import os
+import time
+
+import numpy as np
+
+from icdl2015 import neighbors
+from icdl2015.arm2d import RoboticArm
+from icdl2015.run import just_run
+
+
+traces = [dict(seed=0, T=5000, dim=20, limit=150, d=0.05, adapt_on=False, motor_ratio=0.2),
+          dict(seed=0, T=5000, dim=20, limit=150, d=0.05, adapt_on=True, α=0.1, window=50)]
+
+
+class RecordingNNSet(neighbors.NNSet):
+    """NNSet recording the `nn_y` queries it receives, and when."""
+
+    def __init__(self, **kwargs):
+        super(RecordingNNSet, self).__init__(**kwargs)
+        self.query_at, self.goals = [], []
+
+    def _nn(self, side, v, k=1):
+        if side == 1 and len(self) > 0:
+            self.query_at.append(len(self))
+            self.goals.append(np.array(v, dtype=float))
+        return super(RecordingNNSet, self)._nn(side, v, k=k)
+
+recorders = []
+def make_recorder(y_bounds, **kwargs):
+    recorders.append(RecordingNNSet(**kwargs))
+    return recorders[-1]
+
+
+def record(params):
+    """Return the trace of a `just_run` call, as a dict of arrays."""
+    filepath = 'runs/trace_{}.npz'.format('_'.join('{}{}'.format(key, params[key])
+                                                   for key in sorted(params)))
+    if not os.path.exists(filepath):
+        neighbors.BACKENDS['recording'] = make_recorder
+        try:
+            just_run(nn_backend='recording', **params)
+        finally:
+            del neighbors.BACKENDS['recording']
+        recorder = recorders.pop()
+        os.makedirs('runs', exist_ok=True)
+        np.savez(filepath, xs=recorder.xs, ys=recorder.ys,
+                 query_at=np.array(recorder.query_at), goals=np.array(recorder.goals))
+    with np.load(filepath) as trace:
+        return dict(trace)
+
+def replay(nnset, trace):
+    """Replay a trace on nnset. Return the neighbors distances to the goals,
+    the total duration of the additions and the latency of each query."""
+    xs, ys = trace['xs'], trace['ys']
+    dists, latencies, add_duration, n = [], [], 0.0, 0
+    for query_at, goal in zip(trace['query_at'], trace['goals']):
+        start = time.perf_counter()
+        for i in range(n, query_at):
+            nnset.add(xs[i], ys[i])
+        n = query_at
+        add_duration += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = nnset.nn_y(goal)
+        latencies.append(time.perf_counter() - start)
+        if isinstance(nnset, neighbors.NNSet):
+            dists.append(np.linalg.norm(result[1] - goal))
+        else: # BruteForceNNSet returns distances and indexes
+            dists.append(result[0][0])
+    return np.array(dists), add_duration, np.array(latencies)
+
+
+if __name__ == '__main__':
+    for params in traces:
+        trace = record(params)
+        S_bounds = RoboticArm(params['dim'], params['limit']).S_bounds
+        n_adds, n_queries = trace['query_at'][-1], len(trace['goals'])
+        print('\n{} ({} additions, {} queries)'.format(params, n_adds, n_queries))
+        print('{:>10} {:>10} {:>8} {:>10} {:>12} {:>10}'.format(
+              'backend', 'mismatches', 'adds/s', 'queries/s', 'median (µs)', 'p99 (µs)'))
+
+        candidates = [('oracle', neighbors.BruteForceNNSet())]
+        for name in sorted(neighbors.BACKENDS):
+            candidates.append((name, neighbors.make_nnset(name, y_bounds=S_bounds)))
+        oracle_dists = None
+        for name, nnset in candidates:
+            dists, add_duration, latencies = replay(nnset, trace)
+            if oracle_dists is None:
+                oracle_dists = dists
+            mismatches = np.sum(dists > oracle_dists)
+            print('{:>10} {:>10} {:>8.0f} {:>10.0f} {:>12.1f} {:>10.1f}'.format(
+                  name, mismatches, n_adds/add_duration, n_queries/np.sum(latencies),
+                  1e6*np.median(latencies), 1e6*np.percentile(latencies, 99)))
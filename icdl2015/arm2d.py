@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 
 class RoboticArm(object):
     """A kinematic model of a robotic arm in 2D.
@@ -13,21 +15,64 @@ class RoboticArm(object):
         :param dim:    number of joints
         :param limit:  joints are able to move in (-limit, +limit)"""
         self.dim, self.limit = dim, limit
-        # hold the last executed posture (x, y position of all joints).
-        self.posture = [(0.0, 0.0)]*dim
+        # last executed command; the posture is only computed when requested.
+        self._last_angles = None
+
+    @property
+    def posture(self):
+        """The last executed posture (x, y position of all joints).
+
+        Computed on demand from the last executed command, so that `execute`
+        does not pay for it when the posture is not needed.
+        """
+        if self._last_angles is None:
+            return [(0.0, 0.0)]*self.dim
+        u, v, sum_a, length = 0, 0, 0, 1.0/len(self._last_angles)
+        posture = [(u, v)]
+        for a in reversed(self._last_angles):
+            sum_a += a
+            sum_a_rad = math.radians(sum_a)
+            u, v = u + length * math.sin(sum_a_rad), v + length * math.cos(sum_a_rad)
+            posture.append((u, v))
+        return posture
 
     def execute(self, angles):
-        """Return the position of the end effector. Accepts values in degrees."""
+        """Return the position of the end effector. Accepts values in degrees,
+        as a sequence or an array."""
+        if isinstance(angles, np.ndarray):
+            angles = angles.tolist() # Python floats are faster to iterate on
+        self._last_angles = tuple(angles)
         u, v, sum_a, length = 0, 0, 0, 1.0/len(angles)
-        self.posture = [(u, v)]
         for a in reversed(angles):
             sum_a += a
             # at zero pose, the tip is at x=0,y=1.
             sum_a_rad = math.radians(sum_a)
             u, v = u + length * math.sin(sum_a_rad), v + length * math.cos(sum_a_rad)
-            self.posture.append((u, v))
         return v, u
 
+    def execute_batch(self, commands, postures=False):
+        """Vectorized version of `execute`, for an (N, dim) array of commands.
+
+        Return the (N, 2) array of end effector positions, and, if `postures`
+        is True, the (N, dim+1, 2) array of the corresponding postures.
+
+        Angles and positions are accumulated in the same order as `execute`,
+        so the results are bit-identical to it as long as NumPy's sin and cos
+        match the `math` ones; otherwise, they differ by a few ulps at most
+        (less than 1e-15).
+        """
+        commands = np.asarray(commands, dtype=float)
+        length = 1.0/commands.shape[1]
+        sum_a_rad = np.radians(np.cumsum(commands[:, ::-1], axis=1))
+        us = np.cumsum(length * np.sin(sum_a_rad), axis=1)
+        vs = np.cumsum(length * np.cos(sum_a_rad), axis=1)
+        effects = np.column_stack((vs[:, -1], us[:, -1]))
+        if not postures:
+            return effects
+        posture_array = np.zeros((len(commands), commands.shape[1] + 1, 2))
+        posture_array[:, 1:, 0], posture_array[:, 1:, 1] = us, vs
+        return effects, posture_array
+
     @property
     def M_bounds(self):
         return [(-self.limit, self.limit) for _ in range(self.dim)]
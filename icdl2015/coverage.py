@@ -0,0 +1,595 @@
+"""
+Coverage engines: incremental computation of the area covered by the union of
+the τ-disks centered on the effects, used by `exploration.DiversityMeasure`.
+
+Every engine provides `add(effect)`, which returns the area gained by adding
+the τ-disk centered on effect to the coverage, and an `area` attribute. All
+engines but `VoxelCoverage`, which handles any dimension, assume 2D effects.
+"""
+import math
+
+import numpy as np
+import scipy.ndimage
+import scipy.spatial
+import shapely.geometry
+import shapely.ops
+
+
+# Fidelity tiers of the Shapely computations: resolution of the polygons
+# approximating the disks (segments per quarter circle; the disks are
+# 4·resolution-gons), and period (in additions) and tolerance (relative to τ)
+# of the simplification of the incremental coverage polygon, if any.
+# Measured by `benchmark_fidelity.py` on the figure 3 and 4 workloads, relative
+# to the exact area of the union of the disks, and to the speed of 'standard':
+#   draft:      -0.6% to -1.2% area,  x1.2 to x1.7 faster
+#   standard:   -0.04% to -0.08% area
+#   reference:  -0.003% area,         x0.5 to x0.7 (slower)
+FIDELITIES = {
+    'draft':     {'resolution':  4, 'simplify_every':   50, 'simplify_tolerance': 0.01},
+    'standard':  {'resolution': 16, 'simplify_every': None, 'simplify_tolerance': 0.0},
+    'reference': {'resolution': 64, 'simplify_every': None, 'simplify_tolerance': 0.0},
+}
+
+def fidelity_settings(fidelity):
+    """Return the settings of a fidelity tier (see `FIDELITIES`)."""
+    try:
+        return FIDELITIES[fidelity]
+    except KeyError:
+        raise ValueError('unknown fidelity {!r}; available: {}'.format(
+                         fidelity, ', '.join(sorted(FIDELITIES))))
+
+
+class ShapelyCoverage(object):
+    """Union of Shapely polygons approximating the disks (the reference).
+
+    The cost of each addition grows with the length of the boundary of the
+    coverage, and therefore with time.
+
+    :param fidelity:  fidelity tier (see `FIDELITIES`).
+    """
+
+    def __init__(self, τ, fidelity='standard'):
+        self.τ = τ
+        self.fidelity = fidelity_settings(fidelity)
+        self.polygon = shapely.geometry.MultiPolygon([])
+        self.n = 0 # number of additions
+
+    @property
+    def area(self):
+        return self.polygon.area
+
+    def add(self, effect):
+        old_area = self.polygon.area
+        disk = shapely.geometry.Point(effect).buffer(self.τ, self.fidelity['resolution'])
+        self.polygon = self.polygon.union(disk)
+        area = self.polygon.area
+
+        self.n += 1
+        every = self.fidelity['simplify_every']
+        if every is not None and self.n % every == 0:
+            self.polygon = self.polygon.simplify(self.fidelity['simplify_tolerance']*self.τ,
+                                                 preserve_topology=True)
+        return area - old_area
+
+    def extend(self, effects):
+        """Add several effects at once, merging their disks before the union
+        with the coverage, which is much faster than adding them one by one.
+        Return the area gained."""
+        old_area, old_n = self.polygon.area, self.n
+        resolution = self.fidelity['resolution']
+        disks = [shapely.geometry.Point(effect).buffer(self.τ, resolution) for effect in effects]
+        self.polygon = self.polygon.union(shapely.ops.unary_union(disks))
+        area = self.polygon.area
+
+        self.n += len(disks)
+        every = self.fidelity['simplify_every']
+        if every is not None and self.n // every > old_n // every:
+            self.polygon = self.polygon.simplify(self.fidelity['simplify_tolerance']*self.τ,
+                                                 preserve_topology=True)
+        return area - old_area
+
+
+class GridCoverage(object):
+    """Occupancy bitmap over S_bounds, extended by τ on each side.
+
+    A cell is covered when its center is within τ of an effect. Adding an effect
+    costs O((τ/cell_size)²), independently of the number of past effects.
+
+    Misclassified cells have their center within cell_size/√2 of the boundary
+    of the coverage, so the error on the area is at most √2·cell_size·P + π·cell_size²/2,
+    where P is the perimeter of the coverage (at most 2πτ per disk). For a
+    single disk, that is a relative error of at most 2√2·cell_size/τ; in
+    practice, errors mostly cancel, and are one to two orders of magnitude
+    smaller. Parts of disks outside the extended bounds are ignored.
+
+    :param S_bounds:   sensory space boundaries, as a list of (min, max) tuples.
+    :param cell_size:  side of the cells. Default to τ/20.
+    """
+
+    def __init__(self, τ, S_bounds, cell_size=None):
+        self.τ = τ
+        self.cell_size = τ/20 if cell_size is None else cell_size
+        (x_min, x_max), (y_min, y_max) = S_bounds
+        self.origin = np.array([x_min - τ, y_min - τ])
+        shape = (int(math.ceil((x_max - x_min + 2*τ)/self.cell_size)),
+                 int(math.ceil((y_max - y_min + 2*τ)/self.cell_size)))
+        self.occupied = np.zeros(shape, dtype=bool)
+        self.n_occupied = 0
+
+    @property
+    def area(self):
+        return self.n_occupied * self.cell_size**2
+
+    def add(self, effect):
+        lo = np.floor((np.asarray(effect) - self.τ - self.origin)/self.cell_size).astype(int)
+        hi = np.ceil((np.asarray(effect) + self.τ - self.origin)/self.cell_size).astype(int)
+        lo = np.maximum(lo, 0)
+        hi = np.minimum(hi, self.occupied.shape)
+        if np.any(hi <= lo):
+            return 0.0
+        # cell centers in the bounding box of the disk
+        dx = self.origin[0] + (np.arange(lo[0], hi[0]) + 0.5)*self.cell_size - effect[0]
+        dy = self.origin[1] + (np.arange(lo[1], hi[1]) + 0.5)*self.cell_size - effect[1]
+        disk = dx[:, np.newaxis]**2 + dy[np.newaxis, :]**2 <= self.τ**2
+
+        window = self.occupied[lo[0]:hi[0], lo[1]:hi[1]]
+        gained = np.count_nonzero(disk & ~window)
+        window |= disk
+        self.n_occupied += gained
+        return gained * self.cell_size**2
+
+
+def _covered_arcs(centers, τ, a, b):
+    """Return the start angles and extents of the arcs of the circles of
+    centers[a] covered by the disks of centers[b], all of radius τ, for pairs
+    with 0 < |centers[b] - centers[a]| < 2τ."""
+    diff = centers[b] - centers[a]
+    half = np.arccos(np.hypot(diff[:, 0], diff[:, 1])/(2*τ))
+    return np.arctan2(diff[:, 1], diff[:, 0]) - half, 2*half
+
+def _uncovered_area(centers, τ, owners, starts, extents, signs, circles=None):
+    """Integrate x dy - y dx over the uncovered arcs of circles of radius τ.
+
+    By Green's theorem, the area of a region bounded by circle arcs is the sum,
+    over its boundary arcs, of (r²Δθ + cx·r·Δsin θ - cy·r·Δcos θ)/2. The
+    boundary arcs of circle c are the ones not covered by any of the arcs
+    (owners == c, starts, extents); they are traversed counterclockwise if
+    signs[c] is 1, clockwise if it is -1.
+
+    :param centers:  (n, 2) array of the centers of the circles.
+    :param owners:   circle index of each covered arc.
+    :param circles:  indexes of the circles to integrate over, if not all of
+                     them; owners must be among them.
+    """
+    circles = np.arange(len(centers)) if circles is None else circles
+    n, tau2 = len(circles), 2*math.pi
+    starts = np.mod(starts, tau2)
+    ends = starts + extents
+    wraps = ends > tau2 # split the arcs going past 2π
+    owners = np.concatenate([owners, owners[wraps]])
+    starts = np.concatenate([starts, np.zeros(np.count_nonzero(wraps))])
+    ends = np.concatenate([np.minimum(ends, tau2), ends[wraps] - tau2])
+
+    # sweep the angles of each circle, counting the covering arcs; each circle
+    # has sentinel events at 0 and 2π.
+    angles = np.concatenate([starts, ends, np.zeros(n), np.full(n, tau2)])
+    deltas = np.concatenate([np.ones(len(starts), dtype=int), -np.ones(len(ends), dtype=int),
+                             np.zeros(2*n, dtype=int)])
+    events = np.concatenate([owners, owners, circles, circles])
+    order = np.lexsort((angles, events))
+    angles, events = angles[order], events[order]
+    count = np.cumsum(deltas[order])
+
+    uncovered = (count[:-1] == 0) & (events[:-1] == events[1:])
+    θ1, θ2, c = angles[:-1][uncovered], angles[1:][uncovered], events[:-1][uncovered]
+    arcs = (τ**2*(θ2 - θ1) + τ*centers[c, 0]*(np.sin(θ2) - np.sin(θ1))
+                           - τ*centers[c, 1]*(np.cos(θ2) - np.cos(θ1)))
+    return 0.5*np.dot(signs[c], arcs)
+
+
+def _centers(points):
+    """Return the distinct points, centered on their mean, for smaller rounding
+    errors in the arc integrals."""
+    centers = np.unique(np.asarray(points, dtype=float).reshape(-1, 2), axis=0)
+    if len(centers) > 0:
+        centers -= centers.mean(axis=0)
+    return centers
+
+def _pairs(centers, max_dist):
+    """Return the ordered pairs (a, b) of centers closer than max_dist, sorted
+    by a, and their distances."""
+    pairs = scipy.spatial.cKDTree(centers).query_pairs(max_dist, output_type='ndarray')
+    pairs = np.concatenate([pairs, pairs[:, ::-1]])
+    pairs = pairs[np.argsort(pairs[:, 0], kind='stable')]
+    diff = centers[pairs[:, 1]] - centers[pairs[:, 0]]
+    return pairs, np.hypot(diff[:, 0], diff[:, 1])
+
+def _union_area(centers, τ, pairs, chunk_size):
+    signs = np.ones(len(centers))
+    area = 0.0
+    bounds = np.searchsorted(pairs[:, 0], np.arange(0, len(centers) + chunk_size, chunk_size))
+    for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+        a, b = pairs[start:stop, 0], pairs[start:stop, 1]
+        arc_starts, arc_extents = _covered_arcs(centers, τ, a, b)
+        circles = np.arange(i*chunk_size, min((i + 1)*chunk_size, len(centers)))
+        area += _uncovered_area(centers, τ, a, arc_starts, arc_extents, signs, circles)
+    return area
+
+def union_area(points, τ, chunk_size=2000):
+    """Return the exact area of the union of the disks of radius τ centered on
+    points, with the same boundary arc sweep as `ExactCoverage`.
+
+    :param chunk_size:  number of circles swept at once, to bound memory.
+    """
+    centers = _centers(points)
+    if len(centers) == 0:
+        return 0.0
+    pairs, _ = _pairs(centers, 2*τ)
+    return _union_area(centers, τ, pairs, chunk_size)
+
+def union_areas(points, τs, method='grid', cell_size=None, chunk_size=2000):
+    """Return the array of the areas of the unions of the disks centered on
+    points, for each radius in τs.
+
+    :param method:     'grid' computes the distance of each cell to its nearest
+                       point once (see `_distance_raster`), and counts the
+                       cells within each τ: the cost barely depends on the
+                       number of τ values. 'exact' finds the pairs of close
+                       points once, for the largest τ, and sweeps the arcs for
+                       each τ.
+    :param cell_size:  cell size of the 'grid' method; default to min(τs)/10.
+                       The grid is processed by tiles (see `_distance_raster`):
+                       the memory used is about 50·(1024 + 2·max(τs)/cell_size)²
+                       bytes (75 MB for max(τs)/cell_size = 100), whatever
+                       the size of the grid, while the computation time grows
+                       as its number of cells, 1/cell_size².
+    """
+    τs = np.asarray(τs, dtype=float)
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) == 0:
+        return np.zeros(len(τs))
+    if method == 'grid':
+        cell_size = τs.min()/10 if cell_size is None else cell_size
+        order = np.argsort(τs)
+        counts = np.zeros(len(τs) + 1, dtype=int)
+        for dists in _distance_raster(points, τs.max(), cell_size):
+            counts += np.bincount(np.searchsorted(τs[order], dists.ravel()),
+                                  minlength=len(τs) + 1)
+        areas = np.empty(len(τs))
+        areas[order] = np.cumsum(counts)[:-1] * cell_size**2
+        return areas
+    elif method == 'exact':
+        centers = _centers(points)
+        pairs, dists = _pairs(centers, 2*τs.max())
+        return np.array([_union_area(centers, τ, pairs[dists < 2*τ], chunk_size)
+                         for τ in τs])
+    raise ValueError('unknown method {!r}'.format(method))
+
+def _distance_raster(points, τ_max, cell_size, tile=1024):
+    """Yield, by tiles, the distances of the centers of the cells of a grid over
+    the bounding box of points extended by τ_max, to their nearest point.
+
+    Points are rasterized, and the Euclidean distance transform gives, for each
+    cell, the nearest cell holding a point; the distance is computed to the
+    (last) point in it. It may exceed the distance to the nearest point by at
+    most √2·cell_size, which bounds the error of the covered area as for
+    `GridCoverage`.
+
+    The grid is processed by tiles of tile×tile cells, each rasterized with the
+    points within a margin of τ_max around it: distances up to τ_max are the
+    same as over the whole grid, larger ones may be overestimated. A tile uses
+    about 50 bytes per cell, margin included, whatever the size of the grid.
+    """
+    lo = points.min(axis=0) - τ_max - cell_size
+    shape = np.ceil((points.max(axis=0) + τ_max + cell_size - lo)/cell_size).astype(int)
+    cells = np.floor((points - lo)/cell_size).astype(int)
+    margin = int(np.ceil(τ_max/cell_size)) + 1
+
+    for i in range(0, shape[0], tile):
+        for j in range(0, shape[1], tile):
+            size = np.minimum(tile, shape - (i, j))
+            local = cells - (i - margin, j - margin)
+            inside = np.all((local >= 0) & (local < size + 2*margin), axis=1)
+            if not np.any(inside):
+                yield np.full(size, np.inf)
+                continue
+            local = tuple(local[inside].T)
+            empty = np.ones(size + 2*margin, dtype=bool)
+            empty[local] = False
+            nearest = scipy.ndimage.distance_transform_edt(empty, return_distances=False,
+                                                           return_indices=True)
+            nx, ny = nearest[:, margin:margin + size[0], margin:margin + size[1]]
+            xs, ys = np.zeros(empty.shape), np.zeros(empty.shape)
+            xs[local], ys[local] = points[inside, 0], points[inside, 1]
+
+            cxs = lo[0] + (np.arange(i, i + size[0]) + 0.5)*cell_size
+            cys = lo[1] + (np.arange(j, j + size[1]) + 0.5)*cell_size
+            yield np.hypot(xs[nx, ny] - cxs[:, np.newaxis], ys[nx, ny] - cys[np.newaxis, :])
+
+
+class ExactCoverage(object):
+    """Exact area of the union of disks, computed from the local neighbors only.
+
+    The area a new disk adds only depends on the past effects within 2τ of it,
+    found with a hash of cells of size 2τ. It is the area of the new disk minus
+    the union of its neighbor disks, whose boundary is made of the arcs of the
+    new circle outside the neighbor disks, and of the arcs of the neighbor
+    circles inside the new disk and outside the other neighbor disks (see
+    `_uncovered_area`). The global union is never computed: the cost of an
+    addition is O(k² log k), with k the number of neighbors.
+
+    A disk inside the union of the others never changes the area later disks
+    add: it is not indexed if it adds no area, and it is removed from the index
+    once other disks cover it. For that, the disks of a cell are pruned each
+    time their number doubles, by computing the area each one adds to the
+    union of the others. Only the disks on the boundary of the coverage remain
+    as neighbors, so that the cost of an addition does not grow with the number
+    of past effects, even in clustered runs.
+
+    :param tolerance:  areas below tolerance·πτ² count as no area; each
+                       effect then changes the computed area by at most that
+                       much.
+    """
+
+    def __init__(self, τ, tolerance=1e-9, min_prune=16):
+        self.τ = τ
+        self.area = 0.0
+        self.cells = {}
+        self.min_gain = tolerance*math.pi*τ**2
+        self.min_prune = min_prune
+        self._pruned_sizes = {} # number of disks of each cell after its last pruning
+
+    def _cell(self, effect):
+        return tuple(int(math.floor(e/(2*self.τ))) for e in effect)
+
+    def _neighbors(self, effect):
+        i, j = self._cell(effect)
+        candidates = [p for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                        for p in self.cells.get((i + di, j + dj), ())]
+        if len(candidates) == 0:
+            return np.empty((0, 2))
+        candidates = np.array(candidates) - effect
+        dists = np.hypot(candidates[:, 0], candidates[:, 1])
+        return candidates[dists < 2*self.τ]
+
+    def gain(self, effect):
+        """Return the area the disk centered on effect would add to the coverage."""
+        effect = np.array(effect, dtype=float)
+        neighbors = self._neighbors(effect)
+        if np.any(np.all(neighbors == 0, axis=1)):
+            return 0.0 # already covered by an identical disk
+        centers = np.vstack([np.zeros((1, 2)), np.unique(neighbors, axis=0)])
+        n = len(centers)
+
+        a, b = np.nonzero(~np.eye(n, dtype=bool))
+        diff = centers[b] - centers[a]
+        close = np.hypot(diff[:, 0], diff[:, 1]) < 2*self.τ
+        a, b = a[close], b[close]
+        starts, extents = _covered_arcs(centers, self.τ, a, b)
+        # only the arcs of neighbor circles that are inside the new disk count
+        inside = b == 0
+        starts[inside] += extents[inside]
+        extents[inside] = 2*math.pi - extents[inside]
+
+        signs = -np.ones(n)
+        signs[0] = 1
+        return max(0.0, _uncovered_area(centers, self.τ, a, starts, extents, signs))
+
+    def add(self, effect):
+        gained = self.gain(effect)
+        if gained > self.min_gain:
+            cell = self._cell(effect)
+            disks = self.cells.setdefault(cell, [])
+            disks.append(tuple(effect))
+            if len(disks) >= 2*max(self.min_prune, self._pruned_sizes.get(cell, 0)):
+                self._prune(cell)
+        self.area += gained
+        return gained
+
+    def _prune(self, cell):
+        """Remove the disks of cell covered by the union of the other disks."""
+        disks, i = self.cells[cell], 0
+        while i < len(disks):
+            disk = disks.pop(i)
+            if self.gain(disk) > self.min_gain:
+                disks.insert(i, disk)
+                i += 1
+        self._pruned_sizes[cell] = len(disks)
+
+
+def ball_volume(τ, dim):
+    """Return the volume of a ball of radius τ in dimension dim."""
+    return math.pi**(dim/2)/math.gamma(dim/2 + 1)*τ**dim
+
+
+class VoxelCoverage(object):
+    """Sparse voxel hash, for effect spaces of any dimension.
+
+    A voxel is covered when its center is within τ of an effect; the covered
+    voxels are stored as integer keys in a set, so that only the covered
+    region uses memory, and the effect space needs no bounds. Adding an effect
+    costs O((τ/cell_size)^dim). As with `GridCoverage`, misclassified voxels
+    lie within √dim·cell_size/2 of the boundary of the coverage.
+
+    Keys pack the voxel coordinates, relative to the voxel of the first
+    effect, on 63//dim bits each, which limits the coverage to 2^(63//dim)
+    voxels along each axis, centered on the first effect (1024 in 6
+    dimensions).
+
+    :param cell_size:  side of the voxels. Default to τ/4, or τ/2 above three
+                       dimensions, where the number of voxels per ball grows
+                       quickly (about 3600 candidates per ball in 6 dimensions).
+                       On unions of a few thousand balls, the volume is within
+                       1% of Monte Carlo estimates in 3 to 6 dimensions.
+    """
+
+    def __init__(self, τ, cell_size=None):
+        self.τ = τ
+        self.cell_size = cell_size
+        self.voxels = set()
+        self.dim = None
+        self._origin = None # voxel of the first effect
+
+    @property
+    def area(self):
+        return 0.0 if self.dim is None else len(self.voxels) * self.cell_size**self.dim
+
+    def _init_stencil(self, dim):
+        self.dim = dim
+        if self.cell_size is None:
+            self.cell_size = self.τ/4 if dim <= 3 else self.τ/2
+        # offsets, from the voxel of an effect, of the voxels that may have their
+        # center within τ of it, wherever it is in its voxel.
+        r = int(math.ceil(self.τ/self.cell_size)) + 1
+        offsets = np.stack(np.meshgrid(*dim*[np.arange(-r, r + 1)], indexing='ij'),
+                           axis=-1).reshape(-1, dim)
+        gaps = np.maximum(0, np.abs(offsets) - 0.5)
+        self._offsets = offsets[np.sum(gaps**2, axis=1) <= (self.τ/self.cell_size)**2]
+        self._bits = 63 // dim
+        self._strides = np.left_shift(1, self._bits*np.arange(dim, dtype=np.int64))
+
+    def keys(self, effects):
+        """Return the keys of the voxels covered by the balls centered on
+        effects, an (n, dim) array (possibly with repetitions)."""
+        effects = np.asarray(effects, dtype=float).reshape(-1, self.dim)
+        centers = np.floor(effects/self.cell_size).astype(np.int64)
+        if self._origin is None and len(effects) > 0:
+            self._origin = centers[0]
+        voxels = centers[:, np.newaxis, :] + self._offsets[np.newaxis, :, :]
+        sqdists = np.sum(((voxels + 0.5)*self.cell_size - effects[:, np.newaxis, :])**2, axis=2)
+        voxels = voxels[sqdists <= self.τ**2]
+        voxels = voxels - self._origin + (1 << (self._bits - 1))
+        if np.any(voxels < 0) or np.any(voxels >= 1 << self._bits):
+            raise ValueError('effects are more than {} voxels away from the first one along '
+                             'an axis, too far for the voxel keys (increase cell_size)'.format(
+                             (1 << (self._bits - 1)) - 1))
+        return voxels @ self._strides
+
+    def add(self, effect):
+        if self.dim is None:
+            self._init_stencil(len(effect))
+        new = set(self.keys(effect).tolist())
+        new -= self.voxels
+        self.voxels |= new
+        return len(new) * self.cell_size**self.dim
+
+
+def voxel_volume(points, τ, cell_size=None, chunk_size=1000):
+    """Return the volume of the union of the balls of radius τ centered on
+    points, an (n, dim) array, estimated with the voxels of `VoxelCoverage`."""
+    points = np.asarray(points, dtype=float)
+    if len(points) == 0:
+        return 0.0
+    coverage = VoxelCoverage(τ, cell_size=cell_size)
+    coverage._init_stencil(points.shape[1])
+    keys = np.empty(0, dtype=np.int64)
+    for i in range(0, len(points), chunk_size):
+        keys = np.union1d(keys, coverage.keys(points[i:i + chunk_size]))
+    return len(keys) * coverage.cell_size**coverage.dim
+
+
+class CoverageCurve(object):
+    """Record the area of a coverage engine at checkpoints, as effects are added.
+
+    Effects are only added to the engine when the next checkpoint is reached,
+    in a single batch if the engine has an `extend` method (`ShapelyCoverage`).
+
+    :param coverage:  coverage engine (see `make_coverage`).
+    :param steps:     increasing numbers of effects after which to record the
+                      area (see `checkpoint_steps`).
+    """
+
+    def __init__(self, coverage, steps):
+        self.coverage = coverage
+        self.steps = np.asarray(steps, dtype=int)
+        self.areas = np.full(len(self.steps), np.nan)
+        self.n = 0 # number of effects
+        self._next = 0 # index of the next checkpoint
+        self._pending = [] # effects not yet added to the coverage engine
+
+    def add(self, effect, update=True):
+        """Account for a new effect.
+
+        :param update:  if False, the effect has already been added to the
+                        coverage engine, which is shared with another user.
+        """
+        if update and self._next < len(self.steps): # else, no area to record anymore
+            self._pending.append(effect)
+        self.n += 1
+        while self._next < len(self.steps) and self.steps[self._next] == self.n:
+            self._flush()
+            self.areas[self._next] = self.coverage.area
+            self._next += 1
+
+    def _flush(self):
+        if hasattr(self.coverage, 'extend'):
+            if self._pending:
+                self.coverage.extend(self._pending)
+        else:
+            for effect in self._pending:
+                self.coverage.add(effect)
+        self._pending = []
+
+
+def checkpoint_steps(T, checkpoints):
+    """Return the numbers of effects after which to record the coverage.
+
+    :param checkpoints:  either an int n, to record it every n effects, or a
+                         sequence of numbers of effects, between 1 and T.
+    """
+    if isinstance(checkpoints, (int, np.integer)):
+        if checkpoints <= 0:
+            raise ValueError('checkpoints must be positive, got {}'.format(checkpoints))
+        return np.arange(checkpoints, T + 1, checkpoints)
+    steps = np.unique(np.asarray(checkpoints, dtype=int))
+    if len(steps) > 0 and (steps[0] < 1 or steps[-1] > T):
+        raise ValueError('checkpoints must be between 1 and T={}, got {}'.format(
+                         T, steps[0] if steps[0] < 1 else steps[-1]))
+    return steps
+
+def coverage_curve(effects, τ, checkpoints=1, engine='exact', S_bounds=None, cell_size=None):
+    """Return the checkpoints and the coverage of the first effects at each of
+    them, computed incrementally in a single pass over effects.
+
+    :param checkpoints:  see `checkpoint_steps`.
+    :param engine, S_bounds, cell_size:  see `make_coverage`.
+    """
+    curve = CoverageCurve(make_coverage(engine, τ, S_bounds=S_bounds, cell_size=cell_size),
+                          checkpoint_steps(len(effects), checkpoints))
+    for effect in effects:
+        curve.add(effect)
+    return curve.steps, curve.areas
+
+
+ENGINES = {
+    'shapely': lambda τ, S_bounds, cell_size, fidelity: ShapelyCoverage(τ, fidelity=fidelity),
+    'grid':    lambda τ, S_bounds, cell_size, fidelity: GridCoverage(τ, S_bounds,
+                                                                     cell_size=cell_size),
+    'exact':   lambda τ, S_bounds, cell_size, fidelity: ExactCoverage(τ),
+    'voxel':   lambda τ, S_bounds, cell_size, fidelity: VoxelCoverage(τ, cell_size=cell_size),
+}
+# engines handling effect spaces of any dimension; the others assume 2D effects.
+ANY_DIMENSION_ENGINES = {'voxel'}
+
+def make_coverage(engine='shapely', τ=0.02, S_bounds=None, cell_size=None,
+                  fidelity='standard'):
+    """Create a coverage engine from its name (see `ENGINES`).
+
+    :param S_bounds:   sensory space boundaries, required by the 'grid' engine.
+                       If given, they must be 2D unless the engine handles any
+                       dimension (see `ANY_DIMENSION_ENGINES`).
+    :param cell_size:  cell size of the 'grid' and 'voxel' engines (see
+                       `GridCoverage` and `VoxelCoverage`).
+    :param fidelity:   fidelity tier of the 'shapely' engine (see `FIDELITIES`).
+    """
+    try:
+        factory = ENGINES[engine]
+    except KeyError:
+        raise ValueError('unknown coverage engine {!r}; available: {}'.format(
+                         engine, ', '.join(sorted(ENGINES))))
+    if (S_bounds is not None and len(S_bounds) != 2
+        and engine not in ANY_DIMENSION_ENGINES):
+        raise ValueError('the {!r} coverage engine only handles 2D effects, not {}D ones; '
+                         'use {}'.format(engine, len(S_bounds),
+                                         ' or '.join(map(repr, sorted(ANY_DIMENSION_ENGINES)))))
+    return factory(τ, S_bounds, cell_size, fidelity)
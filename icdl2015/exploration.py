@@ -1,7 +1,6 @@
 """
 Exploration strategy
 """
-import math
 import collections
 
 import numpy as np
@@ -9,7 +8,10 @@ import shapely.geometry
 import shapely.ops
 
 from . import random2 as random
-from .neighbors import NNSet
+from . import snapshot
+from .neighbors import make_nnset
+from .coverage import (make_coverage, union_area, union_areas, fidelity_settings,
+                       voxel_volume, ball_volume)
 
 
 def draw(p):
@@ -19,45 +21,123 @@ def draw(p):
     :param p:    list of positive numbers
     """
     # this function is unecessary complicated to retain random compatibility
-    sum_p = sum(p)
+    cumsum_p = np.cumsum(p) # accumulated in the same order as sum(p)
+    sum_p = cumsum_p[-1]
     dice = random.uniform(0, sum_p)
     if sum_p == 0.0:
         return random.randint(0, len(p)-1)
-    s, i = p[0], 0
-    while (i < len(p)-1 and dice >= s):
-        i += 1
-        assert p[i] >= 0, 'all elements of {} are not positive'.format(p)
-        s += p[i]
+    # first i such that dice < p_0 + ... + p_i
+    i = min(int(np.searchsorted(cumsum_p, dice, side='right')), len(p)-1)
+    assert np.all(np.asarray(p)[1:i+1] >= 0), 'all elements of {} are not positive'.format(p)
     return i
 
 
-def diversity_score(points, τ):
-    areas = [shapely.geometry.Point(xy).buffer(τ) for xy in points]
+def diversity_score(points, τ, method='shapely', fidelity='standard'):
+    """Return the area of the union of the disks of radius τ centered on points.
+
+    :param method:    'shapely' to compute the union of polygons approximating
+                      the disks (64-gons in the standard fidelity tier, whose
+                      area is 0.16% smaller than the disks), 'exact' for the
+                      analytic area of the union of the disks (see
+                      `coverage.union_area`), or 'voxel' to estimate the volume
+                      of the union of balls, in any dimension (see
+                      `coverage.voxel_volume`).
+    :param fidelity:  fidelity tier of the 'shapely' method (see
+                      `coverage.FIDELITIES`).
+    """
+    if method == 'exact':
+        return union_area(points, τ)
+    elif method == 'voxel':
+        return voxel_volume(points, τ)
+    elif method != 'shapely':
+        raise ValueError('unknown diversity method {!r}'.format(method))
+    resolution = fidelity_settings(fidelity)['resolution']
+    areas = [shapely.geometry.Point(xy).buffer(τ, resolution) for xy in points]
     coverage = shapely.ops.unary_union(areas)
     return coverage.area
 
 
+def diversity_scores(points, τs, method='grid', cell_size=None):
+    """Return the array of the diversity scores of points for each τ in τs,
+    sharing the work between the values of τ.
+
+    :param method:     'grid' (approximate, the cost barely depends on the
+                       number of τ values) or 'exact'; see `coverage.union_areas`.
+    :param cell_size:  cell size of the 'grid' method.
+    """
+    return union_areas(points, τs, method=method, cell_size=cell_size)
+
+
+def bounds_arrays(bounds):
+    """Return the arrays of the minima, maxima and ranges of a list of
+    (min, max) tuples."""
+    lo, hi = np.array(bounds, dtype=float).reshape(-1, 2).T
+    return lo, hi, hi - lo
+
+
+def uniform_array(lo, hi):
+    """Return an array of uniform draws in [lo, hi].
+
+    Consumes the random numbers in the same order, and rounds the same way,
+    as `random.uniform(lo_i, hi_i)` on each coordinate in turn. Unlike
+    `random.uniform_array`, draws are scalar: for a few values, it is faster.
+    """
+    return lo + (hi - lo)*np.array([random.random() for _ in range(len(lo))])
+
+
 class DiversityMeasure:
+    """
+    Diversity of each strategy: the average area added to the coverage by its
+    last `window` effects. Diversities are updated with each effect, in O(1),
+    or O(window) when the window is full and exact_sums is True.
+
+    :param coverage:    name of the coverage engine (see `coverage.ENGINES`);
+                        'voxel' handles effect spaces of any dimension.
+    :param S_bounds:    sensory space boundaries, required by the 'grid' engine;
+                        if given, their dimension sets the diversity prior
+                        (the volume of a ball of radius τ).
+    :param cell_size:   cell size of the 'grid' and 'voxel' engines.
+    :param fidelity:    fidelity tier of the 'shapely' engine.
+    :param names:       names of the strategies.
+    :param exact_sums:  if True, the sum of a full window is recomputed when a
+                        value is evicted, as the published results did; if
+                        False, the evicted value is subtracted from a running
+                        sum, which rounds differently.
+    """
 
-    def __init__(self, τ, window):
+    def __init__(self, τ, window, coverage='shapely', S_bounds=None, cell_size=None,
+                 fidelity='standard', names=('goal', 'motor'), exact_sums=True):
         self.τ = τ
         self.window = window
-        self.diversity_diffs = {'goal':  collections.deque([math.pi*self.τ**2], self.window),
-                                'motor': collections.deque([math.pi*self.τ**2], self.window)}
+        self.exact_sums = exact_sums
+        prior = ball_volume(τ, 2 if S_bounds is None else len(S_bounds))
+        self.diversity_diffs = {name: collections.deque([prior], self.window)
+                                for name in names}
+        self._sums = {name: prior for name in names}
+        self._diversities = {name: prior for name in names}
         # coverage: area occupied by the points
-        self.coverage = shapely.geometry.MultiPolygon([])
+        self.coverage = make_coverage(coverage, τ, S_bounds=S_bounds, cell_size=cell_size,
+                                      fidelity=fidelity)
 
     def add_effect(self, name, effect):
-        old_area = self.coverage.area
-        new_point_area = shapely.geometry.Point(effect).buffer(self.τ)
-        # adding the newly explored area to the past one.
-        self.coverage = self.coverage.union(new_point_area)
-        # attribution to the corresponding explorer of the difference (possibly 0)
-        self.diversity_diffs[name].append(self.coverage.area - old_area)
+        # adding the newly explored area to the past one, and attribution to
+        # the corresponding explorer of the difference (possibly 0)
+        diff = self.coverage.add(effect)
+        divdiffs = self.diversity_diffs[name]
+        if len(divdiffs) == divdiffs.maxlen: # the oldest diff is evicted
+            evicted = divdiffs[0]
+            divdiffs.append(diff)
+            if self.exact_sums:
+                self._sums[name] = sum(divdiffs)
+            else:
+                self._sums[name] += diff - evicted
+        else: # same rounding as sum(divdiffs)
+            divdiffs.append(diff)
+            self._sums[name] += diff
+        self._diversities[name] = self._sums[name]/len(divdiffs)
 
     def diversity(self, name):
-        divdiffs = self.diversity_diffs[name]
-        return sum(divdiffs)/len(divdiffs)
+        return self._diversities[name]
 
 
 class AdaptDiversity:
@@ -69,12 +149,42 @@ class AdaptDiversity:
                       chosen, rather than one based on the diversity score.
     :param τ:         threshold value for hyperball diversity computation.
     :param window:    how many timesteps to consider when computing diversity.
+    :param coverage:  coverage engine used to compute diversity: 'shapely',
+                      'exact' (exact and faster), 'grid' (fastest, approximate)
+                      or 'voxel' (approximate, for effect spaces of any
+                      dimension); see `coverage.ENGINES`.
+    :param coverage_cell:  cell size of the 'grid' and 'voxel' coverage engines.
+    :param coverage_fidelity:  fidelity tier of the 'shapely' coverage engine,
+                      'draft', 'standard' or 'reference' (see `coverage.FIDELITIES`).
+    :param nn_backend, nn_poolsize, nn_eps, nn_storage, T:  see `InverseModel`.
+    :param explorers: strategies to choose from, with distinct `name`
+                      attributes, and `explore` and `add_observation` methods.
+                      If None, random motor babbling and random goal babbling,
+                      in that order.
+    :param exact_sums:  see `DiversityMeasure`.
     """
 
-    def __init__(self, M_bounds, S_bounds, d, α, τ, window):
-        self.random_motor = RandomMotorExplorer(M_bounds)
-        self.random_goal = RandomGoalExplorer(M_bounds, S_bounds, d)
-        self.diversity = DiversityMeasure(τ, window)
+    def __init__(self, M_bounds, S_bounds, d, α, τ, window,
+                 coverage='shapely', coverage_cell=None, coverage_fidelity='standard',
+                 nn_backend='sklearn', nn_poolsize=100, nn_eps=0.0, nn_storage=None,
+                 T=None, explorers=None, exact_sums=True):
+        if explorers is None:
+            self.random_motor = RandomMotorExplorer(M_bounds)
+            self.random_goal = RandomGoalExplorer(M_bounds, S_bounds, d, nn_backend=nn_backend,
+                                                  nn_poolsize=nn_poolsize, nn_eps=nn_eps,
+                                                  nn_storage=nn_storage, T=T)
+            explorers = [self.random_motor, self.random_goal]
+        self.explorers = list(explorers)
+        self._indexes = {explorer.name: i for i, explorer in enumerate(self.explorers)}
+        assert len(self._indexes) == len(self.explorers), 'explorers names are not distinct'
+
+        names = [explorer.name for explorer in self.explorers]
+        self.diversity = DiversityMeasure(τ, window, coverage=coverage,
+                                          S_bounds=S_bounds, cell_size=coverage_cell,
+                                          fidelity=coverage_fidelity, names=names,
+                                          exact_sums=exact_sums)
+        # diversities of the explorers, updated with each observation
+        self._diversities = np.array([self.diversity.diversity(name) for name in names])
         self.α = α
         self.last_explorer = None
 
@@ -82,37 +192,50 @@ class AdaptDiversity:
         # choosing the explorer
         a = random.random()
         if a < self.α: # randomly choosing a strategy
-            explorer = random.choice([self.random_motor, self.random_goal])
+            explorer = random.choice(self.explorers)
         else: # choosing proportionally to past diversity
-            i = draw(self.diversities())
-            explorer = [self.random_motor, self.random_goal][i]
+            explorer = self.explorers[draw(self._diversities)]
         self.last_explorer = explorer.name
         return explorer.explore()
 
     def diversities(self):
-        return np.array([self.diversity.diversity('motor'),
-                         self.diversity.diversity('goal')])
+        return self._diversities.copy()
 
-    def add_observation(self, command, effect):
-        self.random_goal.add_observation(command, effect)
-        self.diversity.add_effect(self.last_explorer, effect)
+    def add_observation(self, command, effect, explorer=None):
+        """Add an observation, and credit its diversity to the explorer that
+        proposed the command.
+
+        :param explorer:  name of that explorer, if it is not the last one, as
+                          when observations are delayed (see `pipeline`).
+        """
+        name = self.last_explorer if explorer is None else explorer
+        for explorer_i in self.explorers:
+            explorer_i.add_observation(command, effect)
+        self.diversity.add_effect(name, effect)
+        self._diversities[self._indexes[name]] = self.diversity.diversity(name)
 
 
 class FixedMixture:
 
-    def __init__(self, M_bounds, S_bounds, d, motor_ratio):
+    def __init__(self, M_bounds, S_bounds, d, motor_ratio,
+                 nn_backend='sklearn', nn_poolsize=100, nn_eps=0.0, nn_storage=None,
+                 T=None):
         self.random_motor = RandomMotorExplorer(M_bounds)
-        self.random_goal = RandomGoalExplorer(M_bounds, S_bounds, d)
+        self.random_goal = RandomGoalExplorer(M_bounds, S_bounds, d, nn_backend=nn_backend,
+                                              nn_poolsize=nn_poolsize, nn_eps=nn_eps,
+                                              nn_storage=nn_storage, T=T)
         self.motor_ratio = motor_ratio
+        self.last_explorer = None
 
     def explore(self):
         if random.random() < self.motor_ratio:
             explorer = self.random_motor
         else:
             explorer = self.random_goal
+        self.last_explorer = explorer.name
         return explorer.explore()
 
-    def add_observation(self, command, effect):
+    def add_observation(self, command, effect, explorer=None):
         self.random_goal.add_observation(command, effect)
 
 
@@ -121,23 +244,32 @@ class RandomMotorExplorer:
 
     def __init__(self, M_bounds):
         self.M_bounds = M_bounds
+        self.M_lo, self.M_hi, _ = bounds_arrays(M_bounds)
 
     def explore(self):
-        """Return a motor command to try"""
-        return [random.uniform(a, b) for a, b in self.M_bounds]
+        """Return a motor command to try, as an array"""
+        return uniform_array(self.M_lo, self.M_hi)
+
+    def add_observation(self, command, effect):
+        pass
 
 
 class RandomGoalExplorer:
     name = 'goal'
 
-    def __init__(self, M_bounds, S_bounds, d):
-        self.inverse = InverseModel(d, M_bounds)
+    def __init__(self, M_bounds, S_bounds, d, nn_backend='sklearn', nn_poolsize=100,
+                 nn_eps=0.0, nn_storage=None, T=None):
+        self.inverse = InverseModel(d, M_bounds, S_bounds, nn_backend=nn_backend,
+                                    nn_poolsize=nn_poolsize, nn_eps=nn_eps,
+                                    nn_storage=nn_storage, T=T)
         self.M_bounds, self.S_bounds = M_bounds, S_bounds
+        self.M_lo, self.M_hi, _ = bounds_arrays(M_bounds)
+        self.S_lo, self.S_hi, _ = bounds_arrays(S_bounds)
 
     def explore(self):
-        """Return a motor command to try"""
+        """Return a motor command to try, as an array"""
         # choose a random goal
-        self.goal = [random.uniform(a, b) for a, b in self.S_bounds]
+        self.goal = uniform_array(self.S_lo, self.S_hi)
 
         # choose a corresponding motor command
         try:
@@ -145,34 +277,64 @@ class RandomGoalExplorer:
             return command
         except ValueError:
             random.choice([0]) # to keep random draw exactly similar
-            return [random.uniform(a, b) for a, b in self.M_bounds]
+            return uniform_array(self.M_lo, self.M_hi)
 
     def add_observation(self, command, effect):
         self.inverse.add_observation(command, effect)
 
 
 class InverseModel:
+    """
+    :param nn_backend:   name of the nearest neighbors implementation (see
+                         `neighbors.BACKENDS`), or 'auto' to select it from
+                         the dimension of S_bounds and T.
+    :param nn_poolsize:  pool size of the nearest neighbors implementation, or
+                         'auto' to adapt it to the measured costs.
+    :param nn_eps:       if positive, the nearest command may be approximate:
+                         its effect is at most (1+nn_eps) times farther from
+                         the goal than the nearest one (see `neighbors.NNSet`).
+    :param nn_storage:   if not None, a `storage.MmapStorage` instance, to keep
+                         the observations in memory-mapped files.
+    :param T:            expected number of observations, if known.
+    """
 
-    def __init__(self, d, M_bounds):
+    def __init__(self, d, M_bounds, S_bounds=None, nn_backend='sklearn',
+                 nn_poolsize=100, nn_eps=0.0, nn_storage=None, T=None):
         self.d        = d
         self.M_bounds = M_bounds
-        self.nn       = NNSet()
+        self.M_lo, self.M_hi, M_range = bounds_arrays(M_bounds)
+        self._disturb = self.d * M_range # half width of the perturbation windows
+        self.nn       = make_nnset(nn_backend, dim_y=None if S_bounds is None else len(S_bounds),
+                                   y_bounds=S_bounds, T=T, poolsize=nn_poolsize, eps=nn_eps,
+                                   storage=nn_storage)
 
     def add_observation(self, command, effect):
         """Add an observation, to be available for nearest neighbors requests"""
         self.nn.add(command, effect)
 
+    def save(self, path):
+        """Save a snapshot of the model, including its nearest neighbors indexes."""
+        snapshot.save(self, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a snapshot created by `save`, memory mapping its observations
+        and indexes (unless mmap is False). The model is ready for queries."""
+        model = snapshot.load(path, mmap=mmap)
+        if not isinstance(model, cls):
+            raise TypeError('{} does not hold a {}'.format(path, cls.__name__))
+        return model
+
     def inverse(self, goal):
         """Inverse model: takes a goal; generate a corresponding motor command"""
         # find the nearest command
         nn_command, nn_effect = self.nn.nn_y(goal)
 
-        # perturbate the command
-        new_command_a, new_command = [], []
-        for m_i, (m_i_min, m_i_max) in zip(nn_command, self.M_bounds):
-            min_i = max(m_i_min, m_i - self.d * (m_i_max - m_i_min))
-            max_i = min(m_i_max, m_i + self.d * (m_i_max - m_i_min))
-            new_command.append(random.uniform(min_i, max_i))
+        # perturbate the command, within the motor bounds
+        nn_command = np.asarray(nn_command, dtype=float)
+        min_command = np.clip(nn_command - self._disturb, self.M_lo, self.M_hi)
+        max_command = np.clip(nn_command + self._disturb, self.M_lo, self.M_hi)
+        new_command = uniform_array(min_command, max_command)
 
         random.choice([0]) # to keep random draws exactly similar
         return new_command
@@ -16,6 +16,7 @@ from bokeh.models import LinearColorMapper, BasicTicker, ColorBar, Label
 from bokeh.models import HoverTool
 
 from . import utils_bokeh as ubkh
+from ..coverage import fidelity_settings
 
 
 
@@ -79,12 +80,13 @@ class Figure:
         line = self.fig.circle(x=x, y=y, alpha=alpha,
                                line_color=None, **kwargs)
 
-    def coverage(self, effects, τ, color=C_COLOR):
+    def coverage(self, effects, τ, color=C_COLOR, fidelity='standard'):
         ys, xs = zip(*effects)
         self.fig.circle(xs, ys, radius=τ, fill_color=hexa(color, 0.35),
                                         line_color=None)
 
-        union = shapely.ops.unary_union([shapely.geometry.Point(x, y).buffer(τ)
+        resolution = fidelity_settings(fidelity)['resolution']
+        union = shapely.ops.unary_union([shapely.geometry.Point(x, y).buffer(τ, resolution)
                                          for x, y in zip(xs, ys)])
         boundary = union.boundary
         if isinstance(boundary, shapely.geometry.LineString):
@@ -0,0 +1,136 @@
+"""
+Lockstep simulation of a batch of independent FixedMixture runs.
+
+Sweeps such as the one of figure 4 run hundreds of short, independent
+explorations. Run one by one, each step of each run pays the interpreter
+overhead of the explorers, the arm and the nearest neighbors set. Here, all
+runs of a batch advance together, one step at a time: the commands, goals and
+observations of all runs are stored as arrays, the arm kinematics, the
+perturbations and the nearest neighbors queries are computed for all runs at
+once. Each run has its own random generator, seeded as `run.just_run` seeds
+the global one, from which random numbers are drawn by large blocks.
+
+The results of each run are those of `just_run` with `adapt_on=False`, as
+long as NumPy's sin and cos match the `math` ones (see
+`RoboticArm.execute_batch`), and up to nearest neighbors that are equidistant
+from a goal, within rounding errors.
+"""
+import numpy as np
+import scipy.spatial
+
+from . import random2
+from .arm2d import RoboticArm
+from .exploration import bounds_arrays, diversity_score
+
+
+# offset between the runs along a third coordinate, so that the nearest
+# neighbors of a run in a tree holding all of them are its own effects.
+RUN_OFFSET = 1e3
+# number of random numbers drawn at once for each run (see `Random.random_array`)
+DRAW_BLOCK = 1 << 15
+
+
+class _LockstepNN(object):
+    """Nearest past effects of each run, among the first t ones.
+
+    The effects of all runs are indexed in a single cKDTree, as 3D points
+    (x, y, RUN_OFFSET·run), rebuilt every `poolsize` steps; the effects of
+    the steps after the last rebuild are searched by brute force.
+    """
+
+    def __init__(self, effects, poolsize=512):
+        self.effects = effects
+        self.poolsize = poolsize
+        self.tree, self.tree_steps = None, 0
+
+    def nearest(self, runs, goals, t):
+        """Return, for each run, the step of its effect nearest to its goal."""
+        if t - self.tree_steps >= self.poolsize:
+            points = self.effects[:, :t].reshape(-1, 2)
+            runs_z = np.repeat(RUN_OFFSET*np.arange(len(self.effects)), t)
+            self.tree = scipy.spatial.cKDTree(np.column_stack((points, runs_z)))
+            self.tree_steps = t
+
+        runs = np.asarray(runs)
+        if t > self.tree_steps:
+            diffs = self.effects[runs, self.tree_steps:t] - goals[:, np.newaxis, :]
+            steps = self.tree_steps + np.argmin(np.einsum('rij,rij->ri', diffs, diffs), axis=1)
+            if self.tree is None:
+                return steps
+        _, idxes = self.tree.query(np.column_stack((goals, RUN_OFFSET*runs)))
+        tree_steps = idxes - runs*self.tree_steps
+        if t == self.tree_steps:
+            return tree_steps
+
+        # closest of the tree and pool candidates; on ties, the earliest one.
+        tree_diffs = self.effects[runs, tree_steps] - goals
+        pool_diffs = self.effects[runs, steps] - goals
+        closer = (np.einsum('ri,ri->r', tree_diffs, tree_diffs)
+                  <= np.einsum('ri,ri->r', pool_diffs, pool_diffs))
+        return np.where(closer, tree_steps, steps)
+
+
+def run_lockstep(seeds, T, dim, limit, ds, motor_ratios, τ=0.02, score_method='shapely'):
+    """Run FixedMixture explorations of T steps for each (seed, d, motor_ratio)
+    together, and return the list of their results, as `just_run` does.
+
+    :param seeds, ds, motor_ratios:  sequences of the parameters of each run.
+    :param score_method:  method of the total diversity (see `diversity_score`).
+    """
+    seeds, ds, motor_ratios = list(seeds), np.asarray(ds, dtype=float), np.asarray(motor_ratios)
+    R = len(seeds)
+    assert len(ds) == R and len(motor_ratios) == R
+    rngs = [random2.Random(seed) for seed in seeds]
+
+    arm = RoboticArm(dim, limit)
+    M_lo, M_hi, M_range = bounds_arrays(arm.M_bounds)
+    S_lo, S_hi, S_range = bounds_arrays(arm.S_bounds)
+    disturbs = ds[:, np.newaxis] * M_range # half widths of the perturbation windows
+
+    commands = np.empty((R, T, dim))
+    effects = np.empty((R, T, 2))
+    nn = _LockstepNN(effects)
+    # the random numbers of each run are drawn by blocks, and read in the
+    # order of `FixedMixture.explore`: ratio draw, then either the dim draws
+    # of a motor command, or the 2 draws of a goal, the dim draws of the
+    # perturbation and the one of random.choice([0]) (at t=0, the draw of
+    # random.choice([0]) comes before the dim draws of a random command).
+    draws = np.array([rng.random_array(DRAW_BLOCK) for rng in rngs])
+    positions = np.zeros(R, dtype=int)
+    all_runs = np.arange(R)
+
+    def read(runs, offset, n):
+        starts = positions[runs] + offset
+        return draws[runs[:, np.newaxis], starts[:, np.newaxis] + np.arange(n)]
+
+    for t in range(T):
+        for r in np.flatnonzero(positions > DRAW_BLOCK - (dim + 4)):
+            draws[r] = np.concatenate((draws[r, positions[r]:],
+                                       rngs[r].random_array(positions[r])))
+            positions[r] = 0
+
+        use_motor = draws[all_runs, positions] < motor_ratios
+        if t == 0: # no observation yet: random commands
+            motor_runs, goal_runs = all_runs, all_runs[:0]
+            motor_draws = read(all_runs, np.where(use_motor, 1, 4), dim)
+        else:
+            motor_runs, goal_runs = np.flatnonzero(use_motor), np.flatnonzero(~use_motor)
+            motor_draws = read(motor_runs, 1, dim)
+            goal_draws, perturb_draws = read(goal_runs, 1, 2), read(goal_runs, 3, dim)
+        positions += np.where(use_motor, 1 + dim, 4 + dim)
+
+        commands[motor_runs, t] = M_lo + M_range*motor_draws
+        if len(goal_runs) > 0:
+            goals = S_lo + S_range*goal_draws
+            nn_commands = commands[goal_runs, nn.nearest(goal_runs, goals, t)]
+            min_commands = np.clip(nn_commands - disturbs[goal_runs], M_lo, M_hi)
+            max_commands = np.clip(nn_commands + disturbs[goal_runs], M_lo, M_hi)
+            commands[goal_runs, t] = (min_commands + (max_commands - min_commands)
+                                                     * perturb_draws)
+        effects[:, t] = arm.execute_batch(commands[:, t])
+
+    return [{'effects': effects[r],
+             'diversities': np.array([]),
+             'use_goal': np.array([]),
+             'total_diversity': diversity_score(effects[r], τ, method=score_method)}
+            for r in range(R)]
@@ -1,14 +1,28 @@
+import time
+import warnings
+
 import numpy as np
+import scipy.spatial
 import sklearn.neighbors
 
+from . import snapshot
+
 
 class BruteForceNNSet(object):
     """\
     Naïve implementation, as a API documentation,
     and to verify the correctness of the other implementations.
     """
-    def __init__(self):
+    def __init__(self, capacity=64, storage=None):
+        """
+        :param capacity:  initial number of observations that can be stored
+                          before the storage arrays need to be grown.
+        :param storage:   if not None, a `storage.MmapStorage` instance, to
+                          store the observations out of memory.
+        """
         self._size = 0
+        self._capacity = capacity
+        self._storage = storage
         self.shape = None
 
     def __len__(self):
@@ -19,25 +33,67 @@ class BruteForceNNSet(object):
         assert all(len(v_i) == s_i for v_i, s_i in zip(obs, self.shape))
 
     def add(self, x, y=None):
-        self._size += 1
-
         obs = [x] if y is None else [x, y]
         if self.shape is None:
-            self.shape    = tuple(len(v_i) for v_i in obs)
-            self._data    = [[] for _ in self.shape]
+            self.shape = tuple(len(v_i) for v_i in obs)
+            self._init_index()
 
         self._check_obs(obs)
+        self._append(obs)
+
+    def _init_index(self):
+        # one contiguous array per side; only the first `len(self)` rows are used.
+        if self._storage is None:
+            self._data = [np.empty((self._capacity, s_i)) for s_i in self.shape]
+        else:
+            self._data = [self._storage.empty(self._capacity, s_i) for s_i in self.shape]
 
+    def _append(self, obs):
+        """Store an observation, growing the storage if full: in memory, its
+        capacity is doubled; out of memory, it is extended in place."""
+        if self._size == len(self._data[0]):
+            for i, data_i in enumerate(self._data):
+                if self._storage is None:
+                    self._data[i] = np.empty((max(self._capacity, 2*len(data_i)), data_i.shape[1]))
+                    self._data[i][:self._size] = data_i
+                else:
+                    self._data[i] = self._storage.grow(data_i)
         for i, obs_i in enumerate(obs):
-            self._data[i].append(np.array(obs_i))
+            self._data[i][self._size] = obs_i
+        self._size += 1
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.shape is not None: # only the used part of the storage
+            state['_data'] = [np.asarray(data_i[:self._size]) for data_i in self._data]
+        state['_storage'] = None # restored observations are held by the snapshot
+        return state
+
+    def save(self, path):
+        """Save a snapshot of the set, including its built indexes."""
+        snapshot.save(self, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a snapshot created by `save`. The observations and indexes are
+        memory mapped from the file, and are ready for queries.
+
+        :param mmap:  if False, read the snapshot in memory instead.
+        """
+        nnset = snapshot.load(path, mmap=mmap)
+        if not isinstance(nnset, cls):
+            raise TypeError('{} does not hold a {}'.format(path, cls.__name__))
+        return nnset
 
     @property
     def xs(self):
-        return self._data[0]
+        """View (no copy) of the stored x observations, as a 2D array."""
+        return self._data[0][:self._size]
 
     @property
     def ys(self):
-        return self._data[1]
+        """View (no copy) of the stored y observations, as a 2D array."""
+        return self._data[1][:self._size]
 
     def nn(self, x, k=1):
         return self.nn_x(x, k=k)
@@ -48,6 +104,22 @@ class BruteForceNNSet(object):
     def nn_y(self, y, k=1):
         return self._nn(1, y, k=k)
 
+    def nn_x_batch(self, xs, k=1):
+        return self._nn_batch(0, xs, k=k)
+
+    def nn_y_batch(self, ys, k=1):
+        return self._nn_batch(1, ys, k=k)
+
+    def _nn_batch(self, side, vs, k=1):
+        """ Compute the k nearest neighbors of each row of vs.
+            :arg vs:    (M, d) array of queries.
+            :return:    (M, k) arrays of the distances and indexes of the found
+                        nearest neighbors, in increasing distance order.
+        """
+        results = [self._nn(side, v, k=k) for v in vs]
+        dists, idxes = zip(*results)
+        return np.array(dists), np.array(idxes)
+
     def _nn(self, side, v, k=1):
         """ Compute the k nearest neighbors of v in the observed data,
             :arg side:  if equal to _DATA_X, search among input data.
@@ -56,60 +128,210 @@ class BruteForceNNSet(object):
         """
         assert len(v) == self.shape[side]
         v = np.array(v)
-        data = self._data[side]
+        data = self._data[side][:self._size]
+
+        diffs = data - v
+        # per-row dot products, rounded as `np.linalg.norm(u - v)` would.
+        dists = np.sqrt(np.matmul(diffs[:, np.newaxis, :], diffs[:, :, np.newaxis]).ravel())
+        # all candidates up to the k-th distance, ties included, so that, among
+        # equidistant neighbors, the ones with the lowest indexes are chosen.
+        kth_dist = dists[np.argpartition(dists, k - 1)[k - 1]]
+        idxes = np.flatnonzero(dists <= kth_dist)
+        idxes = idxes[np.lexsort((idxes, dists[idxes]))[:k]]
 
-        results = []
-        for i, u in enumerate(data):
-            results.append((np.linalg.norm(u-v), i))
-        results.sort()
+        return tuple(dists[idxes]), tuple(idxes)
 
-        return tuple(results[i][0] for i in range(k)), tuple(results[i][1] for i in range(k))
+
+class PoolsizeTuner(object):
+    """\
+    Adapts the pool size of an NNSet to the measured rebuild and query costs.
+
+    With a pool of size p, a rebuild of cost R happens every p additions, and
+    each query searches p/2 pool elements on average, at a cost c each. With
+    q queries per addition, the cost per addition, R/p + q*c*p/2, is minimal
+    for p = sqrt(2R/(q*c)). R is the cost of the last rebuild, and c a moving
+    average of the measured pool query costs.
+    """
+
+    def __init__(self, poolsize=100, min_size=10, max_size=10000, smoothing=0.3):
+        self.poolsize = poolsize
+        self.min_size, self.max_size = min_size, max_size
+        self.smoothing = smoothing
+        self._query_cost = None # per query and per pool element
+        self._n_queries  = 0
+
+    def queried(self, duration, n_queries, pool_size):
+        cost = duration / (n_queries * pool_size)
+        if self._query_cost is None:
+            self._query_cost = cost
+        else:
+            self._query_cost += self.smoothing * (cost - self._query_cost)
+        self._n_queries += n_queries
+
+    def rebuilt(self, duration, n_additions):
+        """Return the new pool size, after a rebuild of the given duration."""
+        if self._n_queries > 0 and self._query_cost is not None:
+            q = self._n_queries / n_additions
+            p = np.sqrt(2 * duration / (q * self._query_cost))
+            self.poolsize = int(np.clip(p, self.min_size, self.max_size))
+        self._n_queries = 0
+        return self.poolsize
 
 
 class NNSet(BruteForceNNSet):
+    """\
+    Observations are indexed by a tree, rebuilt every `poolsize` additions.
+    The most recent observations not yet in the tree, the pool, are searched
+    by brute force.
 
-    def __init__(self, poolsize=100):
-        super(NNSet, self).__init__()
+    :param poolsize:  if 'auto', the pool size is adapted during the run to
+                      the measured rebuild and query costs (see `PoolsizeTuner`).
+    :param eps:       if positive, queries may be approximate: the neighbor
+                      returned is at most (1+eps) times farther than the
+                      nearest one. Only the backends that can exploit it
+                      (`CKDTreeNNSet`, `GridNNSet`) do; others stay exact.
+    """
+
+    def __init__(self, poolsize=100, capacity=64, eps=0.0, storage=None):
+        super(NNSet, self).__init__(capacity=capacity, storage=storage)
+        self.eps = eps
+        self._tuner = None
+        if poolsize == 'auto':
+            self._tuner = PoolsizeTuner()
+            poolsize = self._tuner.poolsize
         self.poolsize = poolsize
 
-    def add(self, x, y=None):
-        self._size += 1
+    def _init_index(self):
+        super(NNSet, self)._init_index()
+        self._nn_tree    = [None  for _ in self.shape]
+        self._nn_sizes   = [0     for _ in self.shape]
 
-        obs = [x] if y is None else [x, y]
+    def _pool_size(self, side):
+        return self._size - self._nn_sizes[side]
 
-        if self.shape is None:
-            self.shape      = tuple(len(v_i) for v_i in obs)
-            self._data       = [[]    for _ in self.shape]
-            self._nn_tree    = [None  for _ in self.shape]
-            self._nn_sizes   = [0     for _ in self.shape]
-            self._pool_sizes = [0     for _ in self.shape]
-            self._pool_tree  = [None  for _ in self.shape]
-            self._pool_ready = [False for _ in self.shape]
+    def _pool_sqdists(self, side, vs):
+        """Return the (M, pool size) squared distances between the queries vs
+        and the pool, computed as sklearn's euclidean distances."""
+        start = time.perf_counter()
+        pool = self._data[side][self._nn_sizes[side]:self._size]
+        dists = np.dot(vs, pool.T)
+        dists *= -2
+        dists += np.einsum('ij,ij->i', vs, vs)[:, np.newaxis]
+        dists += np.einsum('ij,ij->i', pool, pool)[np.newaxis, :]
+        np.maximum(dists, 0, out=dists)
+        if self._tuner is not None:
+            self._tuner.queried(time.perf_counter() - start, len(vs), len(pool))
+        return dists
 
-        self._check_obs(obs)
+    def _pool_nn_batch(self, side, vs, k):
+        """Batch version of `_pool_nn`, returning (M, k) arrays."""
+        dists = self._pool_sqdists(side, vs)
+        idxes = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        dists = np.take_along_axis(dists, idxes, axis=1)
+        order = np.argsort(dists, axis=1)
+        return (np.sqrt(np.take_along_axis(dists, order, axis=1)),
+                np.take_along_axis(idxes, order, axis=1))
 
-        for i, obs_i in enumerate(obs):
-            self._data[i].append(np.array(obs_i))
-            self._pool_sizes[i] += 1
-            self._pool_ready[i] = False
+    def _nn_batch(self, side, vs, k=1):
+        if len(self) == 0:
+            raise ValueError('no data')
+        vs = np.asarray(vs, dtype=float)
+        self._update_tree(side)
+        dists, idxes = [], []
+        if self._pool_size(side) > 0:
+            p_dists, p_idxes = self._pool_nn_batch(side, vs, min(k, self._pool_size(side)))
+            dists.append(p_dists)
+            idxes.append(p_idxes + self._nn_sizes[side])
+        for start, size, tree in self._trees(side):
+            t_dists, t_idxes = self._query_tree(tree, vs, min(k, size))
+            dists.append(t_dists)
+            idxes.append(t_idxes + start)
+        return self._merge_batch(dists, idxes, k)
+
+    def _fit_tree(self, data):
+        tree = sklearn.neighbors.NearestNeighbors(algorithm='auto')
+        tree.fit(data)
+        return tree
+
+    def _query_tree(self, tree, vs, k):
+        """Return the (M, k) distances and indexes of the k nearest neighbors
+        of the queries vs in the tree."""
+        return tree.kneighbors(vs, n_neighbors=k)
+
+    @staticmethod
+    def _merge_batch(dists, idxes, k):
+        """Merge (M, k_i) sorted results into the (M, k) best ones."""
+        dists, idxes = np.hstack(dists), np.hstack(idxes)
+        # stable sort: on ties, earlier results (the pool) are preferred.
+        order = np.argsort(dists, axis=1, kind='stable')[:, :k]
+        return (np.take_along_axis(dists, order, axis=1),
+                np.take_along_axis(idxes, order, axis=1))
+
+    def _trees(self, side):
+        """Return the (start, size, tree) of the trees indexing the data."""
+        if self._nn_sizes[side] == 0:
+            return []
+        return [(0, self._nn_sizes[side], self._nn_tree[side])]
+
+    def _pool_nn(self, side, v, k):
+        """Return the distances and pool indexes of the k nearest neighbors
+        of v in the pool, in increasing distance order.
+
+        Distances are computed with the same arithmetic as the brute force
+        algorithm of `sklearn.neighbors.NearestNeighbors`, so that the same
+        neighbors are returned.
+        """
+        dists = self._pool_sqdists(side, np.asarray([v], dtype=float))[0]
+        if k == 1:
+            idxes = np.array([np.argmin(dists)])
+        else:
+            idxes = np.argpartition(dists, k - 1)[:k]
+            idxes = idxes[np.argsort(dists[idxes])]
+        return np.sqrt(dists[idxes]), idxes
 
     def _nn(self, side, v, k=1):
+        if k == 1:
+            return self._nn1(side, v)
+        return self._nn_k(side, v, k)
+
+    def _nn1(self, side, v):
+        """Fast path for k=1: bypasses `kneighbors` input validation and the
+        generic merge, querying the underlying tree and the pool directly."""
+        if self._size == 0:
+            raise ValueError('no data')
+        self._update_tree(side)
+        v = np.array([v], dtype=float)
+        index, dist = None, None
+        if self._pool_size(side) > 0:
+            dists = self._pool_sqdists(side, v)[0]
+            index = np.argmin(dists)
+            dist, index = np.sqrt(dists[index]), index + self._nn_sizes[side]
+        if self._nn_sizes[side] > 0:
+            tree = self._nn_tree[side]
+            if getattr(tree, '_tree', None) is not None: # sklearn kd_tree or ball_tree
+                t_dists, t_idxes = tree._tree.query(v, k=1)
+            else:
+                t_dists, t_idxes = self._query_tree(tree, v, 1)
+            # on ties, the pool is preferred, as in `_nn_k`.
+            if index is None or t_dists[0][0] < dist:
+                index = t_idxes[0][0]
+        return self._data[0][index], self._data[1][index]
+
+    def _nn_k(self, side, v, k):
         if len(self) == 0:
             raise ValueError('no data')
-        v = [v]
         self._update_tree(side)
-        if self._pool_sizes[side] == 0:
-            _, indexes = self._nn_tree[side].kneighbors(v, n_neighbors=k)
-        elif len(self._data[side]) <= self.poolsize:
-            offset = len(self._data[side]) - self._pool_sizes[side]
-            _, indexes = self._pool_tree[side].kneighbors(v, n_neighbors=k)
+        if self._pool_size(side) == 0:
+            _, indexes = self._query_tree(self._nn_tree[side], [v], k)
+        elif self._nn_sizes[side] == 0: # no tree yet
+            _, idxes = self._pool_nn(side, v, min(k, self._pool_size(side)))
+            indexes = [idxes]
         else:
-            t_dists, t_idxes = self._nn_tree[side].kneighbors(v, n_neighbors=min(k, self._nn_sizes[side]))
+            t_dists, t_idxes = self._query_tree(self._nn_tree[side], [v], min(k, self._nn_sizes[side]))
             t_dists, t_idxes = t_dists[0], t_idxes[0]
-            p_dists, p_idxes = self._pool_tree[side].kneighbors(v, n_neighbors=min(k, self._pool_sizes[side]))
-            p_dists, p_idxes = p_dists[0], p_idxes[0]
+            p_dists, p_idxes = self._pool_nn(side, v, min(k, self._pool_size(side)))
             # merge results
-            offset = len(self._data[side]) - self._pool_sizes[side]
+            offset = self._nn_sizes[side]
             dists, idxes = [], []
             t_i, p_i = 0, 0
             for _ in range(k):
@@ -135,15 +357,346 @@ class NNSet(BruteForceNNSet):
 
 
     def _update_tree(self, side):
-        if self._pool_sizes[side] >= self.poolsize:
-            self._nn_tree[side]   = sklearn.neighbors.NearestNeighbors(algorithm='auto')
-            self._nn_tree[side].fit(self._data[side])
-            self._nn_sizes[side] = len(self._data[side])
-            self._pool_sizes[side] = 0
-            self._pool_ready[side] = True
+        if self._pool_size(side) >= self.poolsize:
+            start, n_additions = time.perf_counter(), self._pool_size(side)
+            self._nn_tree[side]  = self._fit_tree(self._data[side][:self._size])
+            self._nn_sizes[side] = self._size
+            self._tune(time.perf_counter() - start, n_additions)
+
+    def _tune(self, duration, n_additions):
+        if self._tuner is not None:
+            self.poolsize = self._tuner.rebuilt(duration, n_additions)
+
+
+class LogNNSet(NNSet):
+    """\
+    Dynamic index using the logarithmic method of Bentley and Saxe.
+
+    Rather than rebuilding a tree over all the data when the pool is full, the
+    pool becomes a new block of observations, indexed by its own tree. Adjacent
+    blocks are merged (and their tree rebuilt) as long as the older one is not
+    more than twice as large as the newer one, or is smaller than `min_block`.
+    Block sizes thus decrease geometrically: a query searches O(log n) trees,
+    and each observation is involved in O(log n) rebuilds over the whole run.
+
+    Blocks are indexed with scipy's cKDTree, whose queries have a lower overhead
+    than sklearn's trees. A k=1 query searches the blocks from the largest
+    one, each within the distance of the nearest neighbor found so far.
+
+    The nearest neighbors found are the same as `NNSet`, except for the choice
+    among equidistant neighbors.
+
+    :param min_block:  blocks smaller than this are merged with the next one,
+                       so that a query searches few small trees.
+    """
+
+    def __init__(self, poolsize=100, capacity=64, eps=0.0, storage=None, min_block=4096):
+        super(LogNNSet, self).__init__(poolsize=poolsize, capacity=capacity, eps=eps,
+                                       storage=storage)
+        self.min_block = min_block
+
+    def _init_index(self):
+        super(LogNNSet, self)._init_index()
+        # (start, size, tree) of each block, in decreasing size order.
+        self._blocks = [[] for _ in self.shape]
+
+    def _update_tree(self, side):
+        if self._pool_size(side) >= self.poolsize:
+            start_time, n_additions = time.perf_counter(), self._pool_size(side)
+            blocks = self._blocks[side]
+            blocks.append((self._nn_sizes[side], self._pool_size(side), None))
+            while len(blocks) >= 2 and (blocks[-2][1] <= 2*blocks[-1][1]
+                                        or blocks[-2][1] < self.min_block):
+                start, size = blocks[-2][0], blocks[-2][1] + blocks[-1][1]
+                blocks[-2:] = [(start, size, None)]
+            if blocks[-1][2] is None:
+                start, size, _ = blocks[-1]
+                tree = self._fit_tree(self._data[side][start:start+size])
+                blocks[-1] = (start, size, tree)
+            self._nn_sizes[side] = self._size
+            self._tune(time.perf_counter() - start_time, n_additions)
+
+    def _fit_tree(self, data):
+        return scipy.spatial.cKDTree(data)
+
+    def _query_tree(self, tree, vs, k):
+        dists, idxes = tree.query(vs, k=k)
+        return np.reshape(dists, (len(vs), k)), np.reshape(idxes, (len(vs), k))
+
+    def _trees(self, side):
+        return self._blocks[side]
+
+    def _nn(self, side, v, k=1):
+        if k > 1:
+            return self._nn_k(side, v, k)
+        if len(self) == 0:
+            raise ValueError('no data')
+        self._update_tree(side)
+        v = np.array(v, dtype=float)
+        index, dist = None, np.inf
+        if self._pool_size(side) > 0:
+            dists = self._pool_sqdists(side, v[np.newaxis])[0]
+            index = np.argmin(dists)
+            dist, index = np.sqrt(dists[index]), index + self._nn_sizes[side]
+        for start, size, tree in self._blocks[side]:
+            # on ties, the pool and the older blocks are preferred.
+            t_dist, t_index = tree.query(v, distance_upper_bound=dist)
+            if t_dist < dist:
+                dist, index = t_dist, t_index + start
+        return self._data[0][index], self._data[1][index]
+
+    def _nn_k(self, side, v, k):
+        if len(self) == 0:
+            raise ValueError('no data')
+        _, idxes = self._nn_batch(side, [v], k=k)
+        index = idxes[0][0]
+        return self._data[0][index], self._data[1][index]
+
+
+class CKDTreeNNSet(NNSet):
+    """\
+    `NNSet` indexing the data with scipy's cKDTree, whose queries have a lower
+    overhead than sklearn's estimators. The nearest neighbors found are the
+    same as `NNSet`, except for the choice among equidistant neighbors.
+    """
+
+    def _fit_tree(self, data):
+        return scipy.spatial.cKDTree(data)
+
+    def _query_tree(self, tree, vs, k):
+        dists, idxes = tree.query(vs, k=k, eps=self.eps)
+        return np.reshape(dists, (len(vs), k)), np.reshape(idxes, (len(vs), k))
+
+
+class GridNNSet(NNSet):
+    """\
+    Indexes the y side with a uniform grid over known bounds, for low
+    dimensional (2D, 3D) effect spaces. The x side is indexed as in `NNSet`.
+
+    Each observation is added to the list of its grid cell in O(1), and the
+    grid is never rebuilt. An insertion costs about 5µs (2µs of which to store
+    the observation), against about 2.5µs for the tree backends, which only
+    store it: their rebuilds are paid by the next query.
+
+    A nearest neighbor query examines the cells around the query by bands of
+    rings of increasing (Chebyshev) radius, and stops once the unexamined
+    cells are necessarily farther than the nearest neighbor found. When more
+    cells than there are observations would be examined, the search is done
+    by brute force instead. Each band costs a dozen NumPy calls: queries far
+    from the observations, which examine several bands, cost more than with
+    the other backends. On `just_run` runs, the grid is faster than cKDTree
+    from T=50000 on, but slower than the logarithmic method (see
+    `select_backend`).
+
+    Observations outside the bounds are assigned to the nearest border cell.
+    The nearest neighbors found are the same as `NNSet`, except for the choice
+    among equidistant neighbors (the oldest observation is returned).
+
+    :param y_bounds:   bounds of the y side, as a list of (min, max) tuples.
+    :param cell_size:  side length of the grid cells.
+    """
+
+    def __init__(self, y_bounds, cell_size=0.02, poolsize=100, capacity=64, eps=0.0,
+                 storage=None):
+        super(GridNNSet, self).__init__(poolsize=poolsize, capacity=capacity, eps=eps,
+                                        storage=storage)
+        self.y_bounds, self.cell_size = y_bounds, cell_size
+        self._grid_min = np.array([a for a, b in y_bounds], dtype=float)
+        spans = np.array([b - a for a, b in y_bounds], dtype=float)
+        self._grid_shape = np.maximum(1, np.ceil(spans/cell_size)).astype(int)
+        self._grid_strides = np.cumprod([1] + list(self._grid_shape[:-1]))
+        # (min, number of cells, stride) of each dimension, as Python scalars,
+        # for the insertions
+        self._grid_dims = list(zip(self._grid_min.tolist(), self._grid_shape.tolist(),
+                                   self._grid_strides.tolist()))
+        self._cells = {}  # linear cell index -> list of observation indexes
+        self._counts = np.zeros(np.prod(self._grid_shape), dtype=np.int32) # 1 if occupied
+        # offsets of the cells around a cell, by increasing Chebyshev radius,
+        # and index of the first offset of each radius in it.
+        self._offsets, self._ring_starts = None, [0]
+
+    def _cell_key(self, y):
+        """Return the cell of y, as a list of coordinates, and its linear index.
+        Computed with scalar arithmetic: on 2D or 3D vectors, NumPy calls cost
+        several times more than the rest of an insertion."""
+        if isinstance(y, np.ndarray):
+            y = y.tolist() # Python floats are faster to compute with
+        cell, key, cell_size = [], 0, self.cell_size
+        for y_i, (y_min, n_cells, stride) in zip(y, self._grid_dims):
+            c = int((y_i - y_min)/cell_size) # same as floor, once clipped
+            if c < 0:
+                c = 0
+            elif c >= n_cells:
+                c = n_cells - 1
+            cell.append(c)
+            key += c*stride
+        return cell, key
+
+    def _append(self, obs):
+        """Store the observation, and add it to its cell."""
+        super(GridNNSet, self)._append(obs)
+        cell, key = self._cell_key(obs[1])
+        indexes = self._cells.get(key)
+        if indexes is not None:
+            indexes.append(self._size - 1)
+            return
+
+        # newly occupied cell: update the bounding box of the occupied cells
+        self._cells[key] = [self._size - 1]
+        self._counts[key] = 1
+        if self._size == 1:
+            self._occupied_min, self._occupied_max = cell, list(cell)
+        else:
+            for i, c in enumerate(cell):
+                if c < self._occupied_min[i]:
+                    self._occupied_min[i] = c
+                elif c > self._occupied_max[i]:
+                    self._occupied_max[i] = c
+
+    def _band(self, r_lo, r_hi):
+        """Return the offsets of the cells at Chebyshev distance r_lo to r_hi."""
+        if r_hi > len(self._ring_starts) - 2: # cache the offsets up to a larger radius
+            radius, dim = max(r_hi, 2*(len(self._ring_starts) - 2)), len(self._grid_shape)
+            offsets = np.indices(dim*(2*radius + 1,)).reshape(dim, -1).T - radius
+            radii = np.max(np.abs(offsets), axis=1)
+            order = np.argsort(radii, kind='stable')
+            self._offsets = offsets[order]
+            self._ring_starts = np.searchsorted(radii[order], np.arange(radius + 2)).tolist()
+        return self._offsets[self._ring_starts[r_lo]:self._ring_starts[r_hi + 1]]
+
+    def _nn(self, side, v, k=1):
+        if side != 1:
+            return super(GridNNSet, self)._nn(side, v, k=k)
+        if len(self) == 0:
+            raise ValueError('no data')
+        _, idxes = self._grid_nn(v, k)
+        return self._data[0][idxes[0]], self._data[1][idxes[0]]
+
+    def _nn_batch(self, side, vs, k=1):
+        if side != 1:
+            return super(GridNNSet, self)._nn_batch(side, vs, k=k)
+        if len(self) == 0:
+            raise ValueError('no data')
+        results = [self._grid_nn(v, k) for v in vs]
+        dists, idxes = zip(*results)
+        return np.array(dists), np.array(idxes)
+
+    def _grid_nn(self, v, k):
+        """Return the distances and indexes of the k nearest neighbors of v
+        on the y side, in increasing distance order.
+
+        Rings are examined by bands of doubling width, starting from the
+        first ring reaching the occupied cells, up to the last one. The first
+        band is wider when the query is far from the occupied cells."""
+        ys = self._data[1][:self._size]
+        center, _ = self._cell_key(v)
+        v = np.asarray(v, dtype=float)
+        r_min = max([0] + [a - c for a, c in zip(self._occupied_min, center)]
+                        + [c - b for c, b in zip(center, self._occupied_max)])
+        r_max = max([c - a for a, c in zip(self._occupied_min, center)]
+                    + [b - c for c, b in zip(center, self._occupied_max)])
+        margins = [min(c, n - 1 - c) for c, n in zip(center, self._grid_shape.tolist())]
+        center = np.array(center)
+
+        idxes, dists, n_found, n_cells = [], [], 0, 0
+        r_lo, width = r_min, 2 + r_min//2
+        while r_lo <= r_max:
+            r_hi = min(r_lo + width - 1, r_max)
+            cells = center + self._band(r_lo, r_hi)
+            n_cells += len(cells)
+            if n_cells > len(self): # cheaper to look at everything
+                idxes = [np.arange(len(self))]
+                dists = [np.sqrt(np.sum((ys - v)**2, axis=1))]
+                break
+            if r_hi > min(margins): # the band crosses the grid borders
+                cells = cells[np.all((cells >= 0) & (cells < self._grid_shape), axis=1)]
+            keys = np.dot(cells, self._grid_strides)
+            band_idxes = []
+            for key in keys[self._counts[keys] > 0].tolist():
+                band_idxes.extend(self._cells[key])
+            if len(band_idxes) > 0:
+                band_idxes = np.array(band_idxes)
+                idxes.append(band_idxes)
+                dists.append(np.sqrt(np.sum((ys[band_idxes] - v)**2, axis=1)))
+                n_found += len(band_idxes)
+            # points in unexamined cells are at least at r_hi*cell_size from v.
+            if n_found >= k:
+                found = dists[0] if len(dists) == 1 else np.concatenate(dists)
+                kth_dist = found.min() if k == 1 else np.partition(found, k - 1)[k - 1]
+                if kth_dist <= (1 + self.eps)*r_hi*self.cell_size:
+                    break
+            r_lo, width = r_hi + 1, 2*width
+        idxes, dists = np.concatenate(idxes), np.concatenate(dists)
+        if k == 1: # on ties, the oldest observation
+            nearest = np.flatnonzero(dists == dists.min())
+            order = nearest[[np.argmin(idxes[nearest])]]
         else:
-            if not self._pool_ready[side]:
-                data = self._data[side][-self._pool_sizes[side]:]
-                self._pool_tree[side]  = sklearn.neighbors.NearestNeighbors(algorithm='brute')
-                self._pool_tree[side].fit(data)
-                self._pool_ready[side] = True
+            order = np.lexsort((idxes, dists))[:k]
+        return dists[order], idxes[order]
+
+
+## Backends
+
+# factories of the available NNSet implementations, by name. Each receives the
+# bounds of the y side (may be None), and the pool size, approximation eps and
+# storage as keyword arguments.
+BACKENDS = {
+    'brute':   lambda y_bounds, poolsize, **kwargs: NNSet(poolsize=float('inf'), **kwargs),
+    'sklearn': lambda y_bounds, **kwargs: NNSet(**kwargs),
+    'log':     lambda y_bounds, **kwargs: LogNNSet(**kwargs),
+    'ckdtree': lambda y_bounds, **kwargs: CKDTreeNNSet(**kwargs),
+    'grid':    lambda y_bounds, **kwargs: GridNNSet(y_bounds, **kwargs),
+}
+# backends whose queries exploit a positive approximation eps
+APPROXIMATE_BACKENDS = {'ckdtree', 'grid'}
+
+def select_backend(dim_y, y_bounds=None, T=None):
+    """Choose a backend for `nn_y` queries, given the dimension of the y side,
+    its bounds, if known, and the expected number of observations T.
+
+    Small (T <= 10000) or high-dimensional (> 15) sets, where trees do not
+    pay off, use brute force; longer runs, or runs of unknown length, use the
+    logarithmic method. The y bounds are not used: the grid, which needs them,
+    is slower in all the runs below.
+
+    On `just_run` FixedMixture runs (dim=20, 2D effects), brute force and the
+    trees are on par up to T=10000 (1.10s for brute force, 0.98s for the
+    logarithmic method and 0.96s for cKDTree); then the logarithmic method is
+    the fastest, at T=20000 (2.40s, against 2.78s for cKDTree), T=50000 (6.5s,
+    against 10.3s) and T=100000 (16.2s, against 32.5s). The grid is slower
+    than the logarithmic method at all these lengths (3.0s against 2.0s at
+    T=20000, 19.0s against 13.6s at T=100000). On 4D effects, the logarithmic
+    method is also the fastest at T=100000 (8.5s against 30.7s for cKDTree).
+    """
+    if dim_y > 15 or (T is not None and T <= 10000):
+        return 'brute'
+    return 'log'
+
+def make_nnset(backend='sklearn', dim_y=None, y_bounds=None, T=None, poolsize=100,
+               eps=0.0, storage=None):
+    """Create an NNSet from a backend name, or 'auto' to select it with
+    `select_backend`.
+
+    :param poolsize:  pool size of the backend, or 'auto' to adapt it to the
+                      measured costs.
+    :param eps:       approximation factor of the queries (see `NNSet`). Only
+                      the `APPROXIMATE_BACKENDS` exploit it: a positive eps
+                      raises a ValueError with other backends, or a warning
+                      if the backend was selected with 'auto'.
+    :param storage:   out of memory storage of the observations, if not None.
+    """
+    auto = backend == 'auto'
+    if auto:
+        backend = select_backend(dim_y, y_bounds=y_bounds, T=T)
+    try:
+        factory = BACKENDS[backend]
+    except KeyError:
+        raise ValueError('unknown NN backend {!r}; available: {}'.format(
+                         backend, ', '.join(sorted(BACKENDS))))
+    if eps > 0 and backend not in APPROXIMATE_BACKENDS:
+        message = ('the {!r} NN backend ignores eps={}: queries are exact; approximate '
+                   'backends: {}'.format(backend, eps, ', '.join(sorted(APPROXIMATE_BACKENDS))))
+        if not auto:
+            raise ValueError(message)
+        warnings.warn(message)
+    return factory(y_bounds, poolsize=poolsize, eps=eps, storage=storage)
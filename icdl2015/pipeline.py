@@ -0,0 +1,114 @@
+"""
+Pipelined exploration, for environments that are slow to execute commands.
+
+Rather than waiting for each effect before proposing the next command, the
+explorer keeps up to `depth` commands in flight: new commands are proposed from
+the observations received so far, and observations are added as they come
+back. Each observation is credited to the strategy that proposed its command,
+so that `AdaptDiversity` stays correct when observations are delayed. The
+throughput then scales with the depth of the pipeline, rather than being bound
+by the latency of the environment.
+
+With `depth=1`, the exploration is the same as the synchronous one of
+`run.just_run`, random draws included.
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from . import random2 as random
+from .arm2d import RoboticArm
+from .exploration import AdaptDiversity, FixedMixture, diversity_score
+
+
+class LatencyArm(object):
+    """Wrapper of a `RoboticArm` simulating a slow environment, where each
+    command takes `latency` seconds (plus a uniform jitter) to execute.
+
+    The jitter is drawn from a dedicated generator, so that it does not affect
+    the random draws of the exploration.
+
+    :param jitter:  maximum additional latency, in seconds.
+    :param seed:    seed of the jitter generator.
+    """
+
+    def __init__(self, arm, latency=0.02, jitter=0.0, seed=0):
+        self.arm = arm
+        self.latency, self.jitter = latency, jitter
+        self._random = np.random.RandomState(seed)
+
+    def __getattr__(self, name): # M_bounds, S_bounds, etc.
+        return getattr(self.arm, name)
+
+    def _delay(self):
+        return self.latency + self.jitter*self._random.random_sample()
+
+    def execute(self, angles):
+        time.sleep(self._delay())
+        return self.arm.execute(angles)
+
+    async def execute_async(self, angles):
+        await asyncio.sleep(self._delay())
+        return self.arm.execute(angles)
+
+
+async def explore_pipelined(explorer, env, T, depth=4):
+    """Run T steps of exploration, with up to `depth` commands in flight.
+
+    :param explorer:  an explorer, such as `AdaptDiversity` or `FixedMixture`.
+    :param env:       an environment providing an `execute_async` coroutine,
+                      such as `LatencyArm`.
+    :return:  the commands, effects and names of the proposing explorers, in
+              the order the observations were received.
+    """
+    commands, effects, names = [], [], []
+    in_flight, proposed = {}, 0
+    while len(effects) < T:
+        while proposed < T and len(in_flight) < depth:
+            command = explorer.explore()
+            task = asyncio.ensure_future(env.execute_async(command))
+            in_flight[task] = (proposed, command, explorer.last_explorer)
+            proposed += 1
+
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in sorted(done, key=lambda task: in_flight[task][0]): # deterministic order
+            _, command, name = in_flight.pop(task)
+            effect = task.result()
+            explorer.add_observation(command, effect, explorer=name)
+            commands.append(command)
+            effects.append(effect)
+            names.append(name)
+    return commands, effects, names
+
+
+def just_run_pipelined(seed, T, dim, limit, d, adapt_on, depth=4, latency=0.02, jitter=0.0,
+                       motor_ratio=None, τ=0.02, α=None, window=None, **kwargs):
+    """Pipelined version of `run.just_run`, on a `LatencyArm`.
+
+    Additional keyword arguments are passed to the explorer. Besides the
+    results of `just_run` (but the diversities), return the duration of the
+    exploration, in seconds.
+    """
+    random.seed(seed)
+
+    arm = LatencyArm(RoboticArm(dim, limit), latency=latency, jitter=jitter, seed=seed)
+    if adapt_on:
+        explorer = AdaptDiversity(arm.M_bounds, arm.S_bounds, d, α, τ, window, T=T, **kwargs)
+    else:
+        explorer = FixedMixture(arm.M_bounds, arm.S_bounds, d, motor_ratio, T=T, **kwargs)
+
+    start = time.time()
+    loop = asyncio.new_event_loop()
+    try:
+        _, effects, names = loop.run_until_complete(
+            explore_pipelined(explorer, arm, T, depth=depth))
+    finally:
+        loop.close()
+    duration = time.time() - start
+
+    effects = np.array(effects)
+    return {'effects': effects,
+            'use_goal': np.array([name == 'goal' for name in names]),
+            'total_diversity': diversity_score(effects, τ),
+            'duration': duration}
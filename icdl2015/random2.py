@@ -53,12 +53,14 @@ from os import urandom as _urandom
 from binascii import hexlify as _hexlify
 import hashlib as _hashlib
 
+import numpy as _np
+
 __all__ = ["Random","seed","random","uniform","randint","choice","sample",
            "randrange","shuffle","normalvariate","lognormvariate",
            "expovariate","vonmisesvariate","gammavariate","triangular",
            "gauss","betavariate","paretovariate","weibullvariate",
            "getstate","setstate","jumpahead", "WichmannHill", "getrandbits",
-           "SystemRandom"]
+           "SystemRandom", "random_array", "uniform_array"]
 
 NV_MAGICCONST = 4 * _exp(-0.5)/_sqrt(2.0)
 TWOPI = 2.0*_pi
@@ -366,6 +368,41 @@ class Random(_random.Random):
         "Get a random number in the range [a, b) or [a, b] depending on rounding."
         return a + (b-a) * self.random()
 
+## -------------------- bulk uniform draws -------------------
+
+    def random_array(self, n):
+        """Return an array of the next n values of random(), drawn in bulk.
+
+        NumPy's legacy RandomState uses the same Mersenne Twister core and the
+        same 53-bit construction of floats as random(): the state is moved to
+        a RandomState, the n values are drawn from it, and the state is moved
+        back, so the stream is the same as with n calls to random().
+
+        Moving the state costs about as much as a few thousand calls to
+        random(): this only pays off for large draws.
+        """
+        if type(self.random) is not _BuiltinMethodType: # random() was overridden
+            return _np.reshape([self.random() for _ in range(int(_np.prod(n)))], n)
+        internalstate = super(Random, self).getstate()
+        numpy_random = self.__dict__.get('_numpy_random')
+        if numpy_random is None: # kept, as creating a RandomState is slow
+            numpy_random = self._numpy_random = _np.random.RandomState(0)
+        numpy_random.set_state(('MT19937', _np.array(internalstate[:-1], dtype=_np.uint32),
+                                internalstate[-1]))
+        values = numpy_random.random_sample(n)
+        _, key, pos = numpy_random.get_state()[:3]
+        super(Random, self).setstate(tuple(key.tolist()) + (pos,))
+        return values
+
+    def uniform_array(self, lo, hi):
+        """Bulk version of uniform(), for arrays of bounds.
+
+        The values are the same as calling uniform(lo_i, hi_i) on each
+        (flattened) coordinate in turn.
+        """
+        lo, hi = _np.broadcast_arrays(_np.asarray(lo, dtype=float), _np.asarray(hi, dtype=float))
+        return lo + (hi-lo) * self.random_array(lo.shape)
+
 ## -------------------- triangular --------------------
 
     def triangular(self, low=0.0, high=1.0, mode=None):
@@ -908,6 +945,8 @@ gauss = _inst.gauss
 betavariate = _inst.betavariate
 paretovariate = _inst.paretovariate
 weibullvariate = _inst.weibullvariate
+random_array = _inst.random_array
+uniform_array = _inst.uniform_array
 getstate = _inst.getstate
 setstate = _inst.setstate
 jumpahead = _inst.jumpahead
@@ -8,6 +8,7 @@ import reproducible
 from . import random2 as random
 
 from .exploration import AdaptDiversity, FixedMixture, diversity_score
+from .coverage import CoverageCurve, checkpoint_steps, make_coverage
 from .arm2d import RoboticArm
 
 
@@ -24,36 +25,72 @@ def just_run(seed, # random seed
              τ=0.02,      # coverage threshold (will be used even if adapt_on is
                           # False to compute the total diversity
              α=None,      # if `adapt_on` is True, ratio of random choice of strategy
-             window=None  # if `adapt_on` is True, number of past trials to consider
+             window=None, # if `adapt_on` is True, number of past trials to consider
                           # when computing diversity.
+             nn_backend='sklearn', # nearest neighbors implementation, or 'auto'
+             nn_poolsize=100,      # nearest neighbors pool size, or 'auto'
+             nn_eps=0.0,           # nearest neighbors approximation factor
+             coverage='shapely',   # if `adapt_on` is True, coverage engine used
+                                   # for diversity, 'shapely', 'exact', 'grid' or 'voxel'
+             score_method='shapely', # method of the total diversity, 'shapely'
+                                     # or 'exact' (see `diversity_score`)
+             fidelity='standard',  # fidelity tier of the Shapely computations,
+                                   # 'draft', 'standard' or 'reference'
+             storage=None,         # if not None, a `storage.MmapStorage` instance,
+                                   # to keep observations and effects out of memory
+             checkpoints=None      # if not None, record the coverage every n steps
+                                   # (int), or after the given numbers of steps (list)
             ):
 
     random.seed(seed)
 
     arm = RoboticArm(dim, limit)
     if adapt_on:
-        explorer = AdaptDiversity(arm.M_bounds, arm.S_bounds, d, α, τ, window)
+        explorer = AdaptDiversity(arm.M_bounds, arm.S_bounds, d, α, τ, window,
+                                  coverage=coverage, coverage_fidelity=fidelity,
+                                  nn_backend=nn_backend, nn_poolsize=nn_poolsize,
+                                  nn_eps=nn_eps, nn_storage=storage, T=T)
     else:
-        explorer = FixedMixture(arm.M_bounds, arm.S_bounds, d, motor_ratio)
+        explorer = FixedMixture(arm.M_bounds, arm.S_bounds, d, motor_ratio,
+                                nn_backend=nn_backend, nn_poolsize=nn_poolsize,
+                                nn_eps=nn_eps, nn_storage=storage, T=T)
 
-    effects     = []
-    diversities = [] # for each timestep, current diversity of motor/goal
-    use_goal    = [] # for each timestep, True if goal explorer is used.
+    if storage is None:
+        effects = np.empty((T, 2))
+    else:
+        effects = storage.empty(T, 2)[:T]
+    # for each timestep, current diversity of motor/goal
+    diversities = np.empty((T, 2)) if adapt_on else np.array([])
+    # for each timestep, True if goal explorer is used.
+    use_goal    = np.empty(T, dtype=bool) if adapt_on else np.array([])
+
+    if checkpoints is not None:
+        # adaptive runs already maintain the coverage; fixed ones use the engine of
+        # `score_method`, so that the area after T steps is the total diversity.
+        curve = CoverageCurve(explorer.diversity.coverage if adapt_on else
+                              make_coverage(score_method, τ, fidelity=fidelity),
+                              checkpoint_steps(T, checkpoints))
 
     for t in range(T):
         m_command = explorer.explore()
         s_effect  = arm.execute(m_command)
         explorer.add_observation(m_command, s_effect)
 
-        effects.append(s_effect)
+        effects[t] = s_effect
         if adapt_on:
-            diversities.append(explorer.diversities())
-            use_goal.append(explorer.last_explorer == 'goal')
-
-    return {'effects': np.array(effects),
-            'diversities': np.array(diversities),
-            'use_goal': np.array(use_goal),
-            'total_diversity': diversity_score(effects, τ)}
+            diversities[t] = explorer.diversities()
+            use_goal[t] = explorer.last_explorer == 'goal'
+        if checkpoints is not None:
+            curve.add(s_effect, update=not adapt_on)
+
+    results = {'effects': effects,
+               'diversities': diversities,
+               'use_goal': use_goal,
+               'total_diversity': diversity_score(effects, τ, method=score_method,
+                                                  fidelity=fidelity)}
+    if checkpoints is not None:
+        results['coverage_steps'], results['coverage'] = curve.steps, curve.areas
+    return results
 
 
 def run(seed, T, dim, limit, adapt_on, d=None,
@@ -0,0 +1,82 @@
+"""
+Snapshots of objects holding large arrays, such as `NNSet` and `InverseModel`.
+
+Objects are pickled with protocol 5, with their contiguous arrays (the stored
+observations, and the arrays of the built trees) written out-of-band. On
+loading, those arrays are memory mapped from the file rather than read, so
+that a restored model is available immediately, without rebuilding any
+index. Pages are read lazily, and copied only if modified.
+
+The file layout is: a magic string, the length of the header, the header (a
+pickled dict of the offsets of each buffer and of the pickle stream), the
+buffers (aligned on 64 bytes), and the pickle stream.
+
+As with any pickle, only load snapshots from trusted sources.
+"""
+import pickle
+import struct
+
+import numpy as np
+
+
+MAGIC = b'ICDLSNAP'
+VERSION = 1
+ALIGNMENT = 64
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def save(obj, path):
+    """Save a snapshot of obj in the file at path."""
+    buffers = []
+    stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+
+    # the header size depends on the offsets, which depend on the header size.
+    header_size = 0
+    while True:
+        offset, buffer_offsets = _aligned(len(MAGIC) + 8 + header_size), []
+        for raw in raws:
+            buffer_offsets.append((offset, raw.nbytes))
+            offset = _aligned(offset + raw.nbytes)
+        stream_offset = offset
+        header = pickle.dumps({'version': VERSION, 'buffers': buffer_offsets,
+                               'stream': (stream_offset, len(stream))})
+        if len(header) <= header_size:
+            break
+        header_size = len(header) + 64 # slack for the offsets to grow
+
+    with open(path, 'wb') as fd:
+        fd.write(MAGIC)
+        fd.write(struct.pack('<Q', header_size))
+        fd.write(header.ljust(header_size, b'\0'))
+        for (offset, _), raw in zip(buffer_offsets, raws):
+            fd.seek(offset)
+            fd.write(raw)
+        fd.seek(stream_offset)
+        fd.write(stream)
+
+def load(path, mmap=True):
+    """Load the snapshot at path.
+
+    :param mmap:  if True, the arrays are memory mapped (copy-on-write) from
+                  the file; otherwise, they are read into memory.
+    """
+    with open(path, 'rb') as fd:
+        if fd.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a snapshot file'.format(path))
+        header_size, = struct.unpack('<Q', fd.read(8))
+        header = pickle.loads(fd.read(header_size))
+        if header['version'] != VERSION:
+            raise ValueError('unsupported snapshot version {}'.format(header['version']))
+        offset, size = header['stream']
+        fd.seek(offset)
+        stream = fd.read(size)
+
+        if mmap:
+            data = np.memmap(path, dtype=np.uint8, mode='c')
+        else:
+            fd.seek(0)
+            data = np.frombuffer(bytearray(fd.read()), dtype=np.uint8)
+    buffers = [data[offset:offset+size] for offset, size in header['buffers']]
+    return pickle.loads(stream, buffers=buffers)
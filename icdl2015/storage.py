@@ -0,0 +1,52 @@
+"""
+Out-of-core storage of observations, for runs too long to fit in memory.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+
+class MmapStorage(object):
+    """\
+    Creates arrays backed by memory-mapped files, that grow in place by
+    chunks of rows: growing extends the file and maps it again, without
+    copying the existing rows. Only the pages in use are kept in memory by the
+    OS, and trees can be built directly on (views of) the arrays.
+
+    Used by the nearest neighbors sets (see `neighbors.BruteForceNNSet`).
+
+    :param directory:   where to create the files. If None, a temporary
+                        directory is used, deleted with the storage.
+    :param dtype:       dtype of the arrays. `np.float32` halves the size of
+                        the files, at the cost of rounding the observations.
+                        sklearn and scipy trees are built on float64 copies
+                        of float32 data; pools and grids are not affected.
+    :param chunk_size:  number of rows by which the arrays grow.
+    """
+
+    def __init__(self, directory=None, dtype=np.float64, chunk_size=65536):
+        if directory is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='icdl2015_')
+            directory = self._tmpdir.name
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+
+    def _map(self, path, n_rows, n_cols):
+        with open(path, 'ab') as fd: # extends the file, filled with zeros
+            fd.truncate(n_rows * n_cols * self.dtype.itemsize)
+        return np.memmap(path, dtype=self.dtype, mode='r+', shape=(n_rows, n_cols))
+
+    def empty(self, n_rows, n_cols):
+        """Return a new (n_rows, n_cols) array, rounded up to a chunk."""
+        n_rows = self.chunk_size * max(1, -(-n_rows // self.chunk_size))
+        fd, path = tempfile.mkstemp(suffix='.dat', dir=self.directory)
+        os.close(fd)
+        return self._map(path, n_rows, n_cols)
+
+    def grow(self, array):
+        """Return the array, extended by one chunk. The array must have been
+        returned by `empty` or `grow`; previous views of it remain valid."""
+        return self._map(array.filename, len(array) + self.chunk_size, array.shape[1])
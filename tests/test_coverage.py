@@ -0,0 +1,18 @@
+"""The incremental 'exact' coverage must keep the area of the union of disks."""
+import numpy as np
+
+from icdl2015.coverage import ExactCoverage, union_area
+
+
+def test_exact_coverage_clustered():
+    """Disks covered by later ones leave the index, without changing the area."""
+    rng = np.random.RandomState(0)
+    τ = 0.02
+    effects = np.concatenate((rng.uniform(-0.1, 0.1, (2000, 2)),
+                              rng.uniform(0.05, 0.15, (1000, 2)),
+                              [[0.0, 0.0], [0.0, 0.0]])) # a duplicate
+    coverage = ExactCoverage(τ)
+    for effect in effects:
+        coverage.add(effect)
+    assert np.isclose(coverage.area, union_area(effects, τ), rtol=1e-12, atol=0)
+    assert sum(len(disks) for disks in coverage.cells.values()) < len(effects)/4
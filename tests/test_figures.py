@@ -0,0 +1,67 @@
+"""The explorations of figures 1 to 3 must reproduce the published ones.
+
+Figures 1 and 2 are compared with the effects plotted in `figures_ref/`. They
+were computed on another platform, whose `math.sin` and `math.cos` may differ
+by one ulp: a tolerance of 1e-12 is allowed. Figure 3 is compared, exactly,
+with the first 1000 steps of its runs, as computed by the original code
+(`tests/data/figure3_ref.npz`).
+"""
+import json
+import os
+import re
+
+import numpy as np
+
+from icdl2015 import arm2d, exploration
+from icdl2015 import random2 as random
+from icdl2015.run import just_run
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def reference_effects(filename, n=5000):
+    """Return the arrays of effects plotted in a figure of `figures_ref/`."""
+    with open(os.path.join(ROOT, 'figures_ref', filename)) as fd:
+        html = fd.read()
+    doc = json.loads(re.search(r'<script type="application/json" id="[^"]*">\s*(.*?)\s*</script>',
+                               html, re.S).group(1))
+    sources = [ref['attributes']['data'] for ref in list(doc.values())[0]['roots']['references']
+               if ref['type'] == 'ColumnDataSource']
+    # effects are (v, u) tuples, plotted as (u, v)
+    return [np.column_stack((data['y'], data['x'])) for data in sources
+            if len(data.get('x', [])) == n]
+
+def assert_reproduces(effects, references):
+    assert any(np.allclose(effects, ref, rtol=0, atol=1e-12) for ref in references)
+
+
+def test_figure1():
+    random.seed(0)
+    arm = arm2d.RoboticArm(20, 150)
+    explorer = exploration.RandomMotorExplorer(arm.M_bounds)
+    effects = [arm.execute(explorer.explore()) for t in range(5000)]
+    assert_reproduces(np.array(effects), reference_effects('figure1.html'))
+
+def test_figure2():
+    references = reference_effects('figure2.html')
+    for d in [0.001, 0.05, 0.5]:
+        random.seed(0)
+        arm = arm2d.RoboticArm(20, 150)
+        explorer_motor = exploration.RandomMotorExplorer(arm.M_bounds)
+        explorer_goal = exploration.RandomGoalExplorer(arm.M_bounds, arm.S_bounds, d)
+        effects = []
+        for t in range(5000):
+            random.uniform(0, 1) # as in figure2.py
+            explorer = explorer_motor if t < 10 else explorer_goal
+            m_command = explorer.explore()
+            s_effect = arm.execute(m_command)
+            explorer_goal.add_observation(m_command, s_effect)
+            effects.append(s_effect)
+        assert_reproduces(np.array(effects), references)
+
+def test_figure3():
+    with np.load(os.path.join(ROOT, 'tests', 'data', 'figure3_ref.npz')) as reference:
+        for d in [0.001, 0.05, 0.5]:
+            results = just_run(0, 1000, 20, 150, d, True, τ=0.02, α=0.1, window=50)
+            for name in ['effects', 'diversities', 'use_goal']:
+                assert np.array_equal(results[name], reference['d{}_{}'.format(d, name)]), name
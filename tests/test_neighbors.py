@@ -0,0 +1,22 @@
+"""The nearest neighbors backends must find neighbors as near as brute force."""
+import numpy as np
+
+from icdl2015.neighbors import BruteForceNNSet, LogNNSet
+
+
+def test_log_nnset():
+    rng = np.random.RandomState(1)
+    for dim_y in [2, 4]:
+        nnset, oracle = LogNNSet(min_block=300), BruteForceNNSet()
+        for t in range(3000):
+            x, y = rng.uniform(0, 1, 5), rng.uniform(0, 1, dim_y)
+            nnset.add(x, y)
+            oracle.add(x, y)
+            if t % 7 == 6:
+                goal = rng.uniform(0, 1, dim_y)
+                for k in [1, 3]:
+                    dists, _ = nnset.nn_y_batch([goal], k=k)
+                    oracle_dists, _ = oracle.nn_y(goal, k=k)
+                    assert np.allclose(dists[0], oracle_dists[:k])
+                _, y_nn = nnset.nn_y(goal)
+                assert np.isclose(np.linalg.norm(y_nn - goal), oracle_dists[0])
@@ -0,0 +1,56 @@
+"""Bulk draws of `random2` must follow the stream of the scalar draws."""
+import numpy as np
+
+from icdl2015 import random2
+
+
+def test_random_array():
+    bulk, scalar = random2.Random(3), random2.Random(3)
+    for n in [0, 1, 5, 623, 624, 625, 1000, 7777]: # around the twister's 624 words
+        values = bulk.random_array(n)
+        assert np.array_equal(values, [scalar.random() for _ in range(n)])
+        assert bulk.getstate() == scalar.getstate()
+    # still the same stream afterwards
+    assert bulk.random() == scalar.random()
+
+def test_random_array_shape():
+    bulk, scalar = random2.Random(5), random2.Random(5)
+    values = bulk.random_array((3, 4))
+    assert values.shape == (3, 4)
+    assert np.array_equal(values.ravel(), [scalar.random() for _ in range(12)])
+    assert bulk.getstate() == scalar.getstate()
+
+def test_uniform_array():
+    bulk, scalar = random2.Random(7), random2.Random(7)
+    lo, hi = np.array([-150.0, 0.0, -1.0000000000000002]), np.array([150.0, 0.3, 1.0])
+    values = bulk.uniform_array(lo, hi)
+    assert np.array_equal(values, [scalar.uniform(a, b) for a, b in zip(lo, hi)])
+    assert np.array_equal(bulk.uniform_array(lo, 1.0),
+                          [scalar.uniform(a, 1.0) for a in lo])
+    assert bulk.getstate() == scalar.getstate()
+
+def test_after_gauss():
+    """gauss() keeps a second value for its next call, which bulk draws must
+    leave untouched."""
+    bulk, scalar = random2.Random(11), random2.Random(11)
+    assert bulk.gauss(0, 1) == scalar.gauss(0, 1)
+    assert np.array_equal(bulk.random_array(100), [scalar.random() for _ in range(100)])
+    assert bulk.getstate() == scalar.getstate()
+    assert bulk.gauss(0, 1) == scalar.gauss(0, 1)
+
+def test_module_functions():
+    random2.seed(13)
+    values = random2.random_array(50)
+    uniforms = random2.uniform_array([0.0, -2.0], [1.0, 2.0])
+    state = random2.getstate()
+
+    random2.seed(13)
+    assert np.array_equal(values, [random2.random() for _ in range(50)])
+    assert np.array_equal(uniforms, [random2.uniform(0.0, 1.0), random2.uniform(-2.0, 2.0)])
+    assert random2.getstate() == state
+
+def test_overridden_random():
+    """Generators with their own random(), such as WichmannHill, use it."""
+    bulk, scalar = random2.WichmannHill(17), random2.WichmannHill(17)
+    assert np.array_equal(bulk.random_array(20), [scalar.random() for _ in range(20)])
+    assert bulk.getstate() == scalar.getstate()